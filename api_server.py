@@ -2,21 +2,36 @@
 # -*- coding: utf-8 -*-
 """
 微信公众号文章抓取器 FastAPI 服务
-提供两个API接口：
+提供以下API接口：
 1. GET /article/info - 获取文章信息
-2. POST /article/save-to-feishu - 保存文章到飞书
+2. GET /article/stream - 流式获取文章信息与逐张OCR结果
+3. POST /article/save-to-feishu - 保存文章到飞书
 """
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel, HttpUrl
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union
 import uvicorn
-from bs4 import BeautifulSoup
+import asyncio
+import json
 import logging
+import mimetypes
+import os
+import time
 
 # 导入现有的类和配置
-from wechat_article_scraper import WeChatArticleScraper, FeishuBitableClient
+from wechat_article_scraper import WeChatArticleScraper, FeishuBitableClient, Deadline
 import config
+import fetcher
+import image_store
+import metrics
+import ocr_scheduler
+import profiling
+import search_index
+from task_queue import create_task_queue
+from task_worker import TASK_ARTICLE
+from ocr_scheduler import SchedulerBusy
 
 # 配置日志
 logging.basicConfig(
@@ -37,11 +52,13 @@ class ArticleRequest(BaseModel):
     url: HttpUrl
     include_ocr: Optional[bool] = True
     download_images: Optional[bool] = True
+    time_budget: Optional[float] = None
 
 class FeishuSaveRequest(BaseModel):
     url: HttpUrl
     include_ocr: Optional[bool] = True
     download_images: Optional[bool] = True
+    time_budget: Optional[float] = None
 
 # 响应模型
 class ImageInfo(BaseModel):
@@ -56,6 +73,12 @@ class OCRResult(BaseModel):
     alt: str
     title: str
 
+class CompactOCRResult(BaseModel):
+    """compact 模式下的OCR结果，图片的链接、描述和标题通过 image_index 引用 images 中的条目"""
+    image_index: int
+    local_path: str
+    ocr_text: str
+
 class ArticleInfo(BaseModel):
     url: str
     title: str
@@ -63,17 +86,58 @@ class ArticleInfo(BaseModel):
     account_name: Optional[str] = ""
     publish_date: Optional[str] = ""
     images: List[ImageInfo]
-    ocr_results: List[OCRResult]
+    ocr_results: List[Union[OCRResult, CompactOCRResult]]
     image_count: int
     content_length: int
+    partial: bool = False
+    pending_images: List[str] = []
 
 class ApiResponse(BaseModel):
     success: bool
     message: str
     data: Optional[Any] = None
 
-# 全局抓取器实例
-scraper = WeChatArticleScraper(output_dir=config.OUTPUT_DIR)
+# /article/info 可通过 fields 参数选择的字段
+ARTICLE_FIELDS = tuple(ArticleInfo.__annotations__)
+
+def add_compression(app):
+    """按 config.API_COMPRESSION 为响应启用压缩"""
+    if config.API_COMPRESSION == 'gzip':
+        from fastapi.middleware.gzip import GZipMiddleware
+        app.add_middleware(GZipMiddleware, minimum_size=config.API_COMPRESSION_MIN_SIZE)
+    elif config.API_COMPRESSION == 'br':
+        try:
+            from brotli_asgi import BrotliMiddleware
+        except ImportError:
+            raise RuntimeError("brotli 压缩需要安装 brotli-asgi: pip install brotli-asgi")
+        # 客户端不支持 brotli 时回退为 gzip
+        app.add_middleware(BrotliMiddleware, minimum_size=config.API_COMPRESSION_MIN_SIZE, gzip_fallback=True)
+    elif config.API_COMPRESSION:
+        raise ValueError(f"不支持的压缩方式: {config.API_COMPRESSION}")
+
+add_compression(app)
+# 最后添加的中间件位于最外层，性能分析覆盖压缩在内的完整请求
+app.add_middleware(profiling.ProfilingMiddleware)
+
+# 全局抓取器实例在首次使用时创建（或由 /warmup 预先创建），缩短启动时间
+_scraper = None
+
+def get_scraper():
+    """获取全局抓取器实例"""
+    global _scraper
+    if _scraper is None:
+        _scraper = WeChatArticleScraper(output_dir=config.OUTPUT_DIR)
+    return _scraper
+
+# 任务队列在首次使用时创建
+_task_queue = None
+
+def get_task_queue():
+    """获取任务队列（按 config.TASK_QUEUE_URL 创建）"""
+    global _task_queue
+    if _task_queue is None:
+        _task_queue = create_task_queue()
+    return _task_queue
 
 @app.get("/")
 async def root():
@@ -83,13 +147,53 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "/article/info": "GET - 获取文章信息",
+            "/article/stream": "GET - 以NDJSON流式返回文章信息与逐张OCR结果",
             "/article/save-to-feishu": "POST - 保存文章到飞书",
+            "/tasks": "POST - 提交异步抓取任务，由 worker 进程处理",
+            "/tasks/{task_id}": "GET - 查询异步任务状态与结果",
+            "/search": "GET - 全文检索已处理的文章（标题、公众号、正文、OCR文本）",
+            "/images": "GET - 读取已下载的图片（OCR结果中的 local_path）",
+            "/metrics": "GET - Prometheus 运行指标",
+            "/warmup": "GET - 预热：创建抓取器并加载解析库与OCR引擎",
+            "/profiles/{name}": "GET - 下载请求性能分析结果（请求头 X-Profile 或参数 profile 开启）",
             "/docs": "API文档"
         }
     }
 
+def check_time_budget(budget):
+    """时间预算须为空（不限时）或大于0"""
+    if budget is not None and budget <= 0:
+        raise HTTPException(status_code=400, detail="time_budget 必须大于0")
+    return budget
+
+def make_deadline(time_budget):
+    """按请求参数或默认配置创建时间预算"""
+    budget = time_budget if time_budget is not None else config.API_DEFAULT_TIME_BUDGET
+    return Deadline(check_time_budget(budget))
+
+def parse_fields(fields):
+    """解析逗号分隔的 fields 参数，返回字段集合；为空表示返回全部字段"""
+    if not fields:
+        return None
+    selected = {field.strip() for field in fields.split(',') if field.strip()}
+    unknown = selected - set(ARTICLE_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"未知字段: {', '.join(sorted(unknown))}，可选字段: {', '.join(ARTICLE_FIELDS)}"
+        )
+    return selected
+
+def raise_article_unavailable(deadline):
+    """文章获取失败：预算用尽返回504，否则返回400"""
+    if deadline.timed_out():
+        raise HTTPException(status_code=504, detail="时间预算内未能获取文章内容")
+    raise HTTPException(status_code=400, detail="无法获取文章内容，请检查URL是否正确")
+
 @app.get("/article/info", response_model=ApiResponse)
-async def get_article_info(url: str, include_ocr: bool = True, download_images: bool = True):
+async def get_article_info(url: str, include_ocr: bool = True, download_images: bool = True,
+                           time_budget: Optional[float] = None, fields: Optional[str] = None,
+                           compact: bool = False):
     """
     功能1：获取文章信息
     
@@ -97,84 +201,111 @@ async def get_article_info(url: str, include_ocr: bool = True, download_images:
         url: 微信公众号文章链接
         include_ocr: 是否进行OCR识别
         download_images: 是否下载图片
+        time_budget: 时间预算（秒），到期返回已完成的OCR结果并标记 partial
+        fields: 逗号分隔的返回字段（如 title,ocr_results），为空返回全部字段；
+                不包含 ocr_results / partial / pending_images 时不进行OCR
+        compact: OCR结果以 image_index 引用 images 中的图片，不重复图片链接、描述和标题
     
     Returns:
         包含文章标题、正文、图片等信息的响应
     """
     try:
         logger.info(f"开始处理文章信息请求: {url}")
+        deadline = make_deadline(time_budget)
+        selected = parse_fields(fields)
+        with_images = download_images and include_ocr and (
+            selected is None or bool(selected & {'ocr_results', 'partial', 'pending_images'})
+        )
         
-        # 获取基本文章内容
-        article_info = scraper.get_article_content(url)
+        # 逐项消费文章信息与OCR结果
+        article_info = None
+        image_index = {}
+        ocr_results = []
+        pending_images = []
+        async for kind, payload in get_scraper().aiter_article(
+            url, with_images=with_images, delay=0, deadline=deadline,
+            priority=ocr_scheduler.INTERACTIVE
+        ):
+            if kind == 'article':
+                article_info = payload
+                for i, img in enumerate(article_info['images']):
+                    image_index.setdefault(img['src'], i)
+            elif kind == 'partial':
+                pending_images = payload['pending_images']
+            elif compact and payload['image_url'] in image_index:
+                ocr_results.append({
+                    'image_index': image_index[payload['image_url']],
+                    'local_path': payload['local_path'],
+                    'ocr_text': payload['ocr_text'],
+                })
+            else:
+                ocr_results.append(payload)
         if not article_info:
-            raise HTTPException(status_code=400, detail="无法获取文章内容，请检查URL是否正确")
+            raise_article_unavailable(deadline)
         
-        # 获取公众号名称和发布日期
-        try:
-            response = scraper.session.get(url, headers=scraper.headers, timeout=30)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            account_name = scraper.extract_account_name(soup)
-            publish_date = scraper.extract_publish_date(soup)
-        except Exception as e:
-            logger.warning(f"获取公众号信息失败: {e}")
-            account_name = ""
-            publish_date = ""
-        
-        # 处理图片和OCR（如果需要）
-        if download_images and include_ocr:
-            for i, img_info in enumerate(article_info['images']):
-                try:
-                    # 生成文件名
-                    file_extension = scraper._get_file_extension(img_info['src'])
-                    filename = f"{config.IMAGE_FILENAME_PREFIX}{i+1}{file_extension}"
-                    
-                    # 下载图片
-                    image_path = scraper.download_image(img_info['src'], filename)
-                    
-                    if image_path:
-                        # OCR识别
-                        ocr_text = scraper.ocr_image(image_path)
-                        
-                        # 保存OCR结果
-                        article_info['ocr_results'].append({
-                            'image_url': img_info['src'],
-                            'local_path': image_path,
-                            'ocr_text': ocr_text,
-                            'alt': img_info['alt'],
-                            'title': img_info['title']
-                        })
-                except Exception as e:
-                    logger.error(f"处理图片 {i+1} 失败: {e}")
-                    if not config.CONTINUE_ON_ERROR:
-                        raise HTTPException(status_code=500, detail=f"处理图片失败: {e}")
-        
-        # 构建响应数据
-        response_data = ArticleInfo(
-            url=article_info['url'],
-            title=article_info['title'],
-            content=article_info['content'],
-            account_name=account_name,
-            publish_date=publish_date,
-            images=[ImageInfo(**img) for img in article_info['images']],
-            ocr_results=[OCRResult(**ocr) for ocr in article_info['ocr_results']],
-            image_count=len(article_info['images']),
-            content_length=len(article_info['content'])
-        )
+        # 构建响应数据（字段同 ArticleInfo），只保留请求的字段
+        response_data = {
+            'url': article_info['url'],
+            'title': article_info['title'],
+            'content': article_info['content'],
+            'account_name': article_info['account_name'],
+            'publish_date': article_info['publish_date'],
+            'images': article_info['images'],
+            'ocr_results': ocr_results,
+            'image_count': len(article_info['images']),
+            'content_length': len(article_info['content']),
+            'partial': bool(pending_images),
+            'pending_images': pending_images,
+        }
+        if selected is not None:
+            response_data = {key: value for key, value in response_data.items() if key in selected}
         
         logger.info(f"成功处理文章: {article_info['title']}")
         return ApiResponse(
             success=True,
-            message="文章信息获取成功",
+            message="文章信息获取成功" if not pending_images else "时间预算已用尽，返回部分OCR结果",
             data=response_data
         )
         
     except HTTPException:
         raise
+    except SchedulerBusy as e:
+        logger.warning(f"OCR队列已满: {e}")
+        raise HTTPException(status_code=503, detail=f"OCR服务繁忙，请稍后重试: {e}")
     except Exception as e:
         logger.error(f"获取文章信息失败: {e}")
         raise HTTPException(status_code=500, detail=f"服务器内部错误: {str(e)}")
 
+@app.get("/article/stream")
+async def stream_article_info(url: str, include_ocr: bool = True, download_images: bool = True,
+                              time_budget: Optional[float] = None):
+    """
+    以NDJSON流式返回文章信息
+
+    第一行为文章基本信息（type=article），之后每处理完一张图片输出一行OCR结果（type=image），
+    适合图片很多的文章：客户端可边接收边处理，服务端也无需累积整篇文章的OCR结果。
+    时间预算用尽时输出一行 type=partial 列出未处理的图片；文章获取失败时输出一行 type=error。
+    """
+    deadline = make_deadline(time_budget)
+
+    async def generate():
+        found = False
+        try:
+            async for kind, payload in get_scraper().aiter_article(
+                url, with_images=download_images and include_ocr, delay=0, deadline=deadline,
+                priority=ocr_scheduler.INTERACTIVE
+            ):
+                found = True
+                yield json.dumps({"type": kind, "data": payload}, ensure_ascii=False) + "\n"
+        except SchedulerBusy as e:
+            yield json.dumps({"type": "error", "data": f"OCR服务繁忙: {e}"}, ensure_ascii=False) + "\n"
+            return
+        if not found:
+            yield json.dumps({"type": "error", "data": "无法获取文章内容，请检查URL是否正确"}, ensure_ascii=False) + "\n"
+
+    logger.info(f"开始流式处理文章: {url}")
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
 @app.post("/article/save-to-feishu", response_model=ApiResponse)
 async def save_article_to_feishu(request: FeishuSaveRequest, background_tasks: BackgroundTasks):
     """
@@ -194,52 +325,27 @@ async def save_article_to_feishu(request: FeishuSaveRequest, background_tasks: B
         if not config.FEISHU_ENABLED:
             raise HTTPException(status_code=400, detail="飞书功能未启用")
         
-        # 获取文章内容
-        article_info = scraper.get_article_content(str(request.url))
-        if not article_info:
-            raise HTTPException(status_code=400, detail="无法获取文章内容，请检查URL是否正确")
-        
-        # 获取公众号名称和发布日期
-        try:
-            response = scraper.session.get(str(request.url), headers=scraper.headers, timeout=30)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            account_name = scraper.extract_account_name(soup)
-            publish_date = scraper.extract_publish_date(soup)
-        except Exception as e:
-            logger.warning(f"获取公众号信息失败: {e}")
-            account_name = ""
-            publish_date = ""
+        deadline = make_deadline(request.time_budget)
         
-        # 如果需要OCR，在后台处理图片
-        ocr_text = ""
-        if request.download_images and request.include_ocr:
-            # 同步处理OCR（为了确保数据完整性）
-            for i, img_info in enumerate(article_info['images']):
-                try:
-                    file_extension = scraper._get_file_extension(img_info['src'])
-                    filename = f"{config.IMAGE_FILENAME_PREFIX}{i+1}{file_extension}"
-                    image_path = scraper.download_image(img_info['src'], filename)
-                    
-                    if image_path:
-                        ocr_result = scraper.ocr_image(image_path)
-                        article_info['ocr_results'].append({
-                            'image_url': img_info['src'],
-                            'local_path': image_path,
-                            'ocr_text': ocr_result,
-                            'alt': img_info['alt'],
-                            'title': img_info['title']
-                        })
-                except Exception as e:
-                    logger.error(f"处理图片 {i+1} 失败: {e}")
-                    if not config.CONTINUE_ON_ERROR:
-                        raise HTTPException(status_code=500, detail=f"处理图片失败: {e}")
-            
-            # 组装OCR文本
-            ocr_combined = []
-            for i, item in enumerate(article_info.get('ocr_results', [])):
-                ocr_combined.append(f"[图片{i+1}] {item.get('image_url','')}\n{item.get('ocr_text','')}")
-            ocr_text = "\n\n".join(ocr_combined) if ocr_combined else ""
+        # 逐项消费文章信息与OCR结果，只保留拼接飞书正文所需的文本
+        article_info = None
+        ocr_combined = []
+        pending_images = []
+        async for kind, payload in get_scraper().aiter_article(
+            str(request.url), with_images=request.download_images and request.include_ocr,
+            delay=0, deadline=deadline, priority=ocr_scheduler.INTERACTIVE
+        ):
+            if kind == 'article':
+                article_info = payload
+            elif kind == 'partial':
+                pending_images = payload['pending_images']
+            else:
+                ocr_combined.append(f"[图片{len(ocr_combined)+1}] {payload['image_url']}\n{payload['ocr_text']}")
+        if not article_info:
+            raise_article_unavailable(deadline)
+        account_name = article_info['account_name']
+        publish_date = article_info['publish_date']
+        ocr_text = "\n\n".join(ocr_combined)
         
         # 组装完整内容
         full_content = article_info['content']
@@ -282,21 +388,143 @@ async def save_article_to_feishu(request: FeishuSaveRequest, background_tasks: B
                 "publish_date": publish_date,
                 "content_length": len(full_content),
                 "image_count": len(article_info['images']),
-                "ocr_count": len(article_info['ocr_results']),
+                "ocr_count": len(ocr_combined),
+                "partial": bool(pending_images),
+                "pending_images": pending_images,
                 "feishu_record_id": result.get('data', {}).get('record', {}).get('record_id', '')
             }
         )
         
     except HTTPException:
         raise
+    except SchedulerBusy as e:
+        logger.warning(f"OCR队列已满: {e}")
+        raise HTTPException(status_code=503, detail=f"OCR服务繁忙，请稍后重试: {e}")
     except Exception as e:
         logger.error(f"保存到飞书失败: {e}")
         raise HTTPException(status_code=500, detail=f"保存到飞书失败: {str(e)}")
 
+@app.post("/tasks", response_model=ApiResponse)
+async def submit_task(request: ArticleRequest):
+    """
+    提交异步抓取任务
+
+    任务写入持久化队列，由 `python wechat_article_scraper.py --worker` 进程领取处理，
+    通过 GET /tasks/{task_id} 查询结果。
+    """
+    check_time_budget(request.time_budget)
+    try:
+        task_id = await asyncio.to_thread(get_task_queue().enqueue, TASK_ARTICLE, {
+            'url': str(request.url),
+            'with_images': bool(request.download_images and request.include_ocr),
+            'delay': 0,
+            'time_budget': request.time_budget,
+        })
+    except Exception as e:
+        logger.error(f"提交任务失败: {e}")
+        raise HTTPException(status_code=503, detail=f"任务队列不可用: {e}")
+    logger.info(f"已提交任务 {task_id}: {request.url}")
+    return ApiResponse(success=True, message="任务已提交", data={"task_id": task_id, "status": "queued"})
+
+@app.get("/tasks/{task_id}", response_model=ApiResponse)
+async def get_task(task_id: str):
+    """查询异步任务状态（queued / leased / done / failed）与结果"""
+    try:
+        task = await asyncio.to_thread(get_task_queue().get, task_id)
+    except Exception as e:
+        logger.error(f"查询任务失败: {e}")
+        raise HTTPException(status_code=503, detail=f"任务队列不可用: {e}")
+    if task is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return ApiResponse(success=True, message=f"任务状态: {task['status']}", data=task)
+
+@app.get("/search", response_model=ApiResponse)
+async def search_articles(q: str, limit: int = 20, offset: int = 0, account_name: Optional[str] = None):
+    """
+    全文检索已处理的文章
+
+    Args:
+        q: 查询词，多个词以空格分隔，需全部命中
+        limit: 返回条数
+        offset: 跳过的条数（分页）
+        account_name: 只检索指定公众号的文章
+
+    Returns:
+        按相关度排序的文章列表
+    """
+    index = search_index.get_index()
+    if index is None:
+        raise HTTPException(status_code=400, detail="全文检索未启用")
+    if not 1 <= limit <= config.SEARCH_MAX_LIMIT or offset < 0:
+        raise HTTPException(status_code=400, detail=f"limit 必须在 1~{config.SEARCH_MAX_LIMIT} 之间，offset 不能为负")
+    hits = await asyncio.to_thread(
+        profiling.call, index.search, q, limit=limit, offset=offset, account_name=account_name
+    )
+    return ApiResponse(success=True, message=f"找到 {len(hits)} 篇文章", data=hits)
+
+@app.get("/images")
+async def get_image(path: str):
+    """
+    读取已下载的图片
+
+    Args:
+        path: OCR结果中的 local_path，普通文件路径或 "<pack 路径>#<图片名>" 引用
+    """
+    pack_path, name = image_store.split_ref(path)
+    root = os.path.realpath(config.OUTPUT_DIR)
+    try:
+        inside = os.path.commonpath([root, os.path.realpath(pack_path or path)]) == root
+    except ValueError:
+        inside = False
+    if not inside:
+        raise HTTPException(status_code=400, detail="只能读取图片下载目录中的文件")
+    try:
+        data = await asyncio.to_thread(profiling.call, image_store.read_image, path)
+    except (FileNotFoundError, IsADirectoryError, KeyError):
+        raise HTTPException(status_code=404, detail="图片不存在")
+    media_type = mimetypes.guess_type(name or path)[0] or "application/octet-stream"
+    return Response(content=data, media_type=media_type)
+
+@app.get("/warmup")
+async def warmup():
+    """
+    预热：创建抓取器，加载HTML解析库与OCR引擎，启动OCR工作线程
+
+    适合作为容器的启动探针，所有组件就绪时返回200，否则返回503。
+    """
+    start = time.perf_counter()
+    scraper = get_scraper()
+    components = {'scraper': {'ok': True, 'seconds': round(time.perf_counter() - start, 3)}}
+    components.update(await asyncio.to_thread(scraper.warmup))
+    if not all(component['ok'] for component in components.values()):
+        raise HTTPException(status_code=503, detail={"message": "部分组件预热失败", "components": components})
+    return ApiResponse(success=True, message="预热完成", data=components)
+
+@app.get("/profiles/{name}")
+async def get_profile(name: str):
+    """下载请求性能分析结果（文件名见响应头 X-Profile-Id）"""
+    path = os.path.join(config.PROFILE_DIR, os.path.basename(name))
+    if not name.endswith(('.prof', '.folded')) or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="性能分析结果不存在")
+    return FileResponse(path, media_type="application/octet-stream" if name.endswith('.prof') else "text/plain")
+
 @app.get("/health")
 async def health_check():
-    """健康检查接口"""
-    return {"status": "healthy", "message": "服务运行正常"}
+    """健康检查接口，任一主机处于熔断状态时 status 为 degraded"""
+    breakers = fetcher.breaker_states()
+    degraded = [host for host, state in breakers.items() if state['state'] != 'closed']
+    return {
+        "status": "degraded" if degraded else "healthy",
+        "message": f"主机熔断中: {', '.join(degraded)}" if degraded else "服务运行正常",
+        "ocr_queue": ocr_scheduler.get_scheduler().stats(),
+        "circuit_breakers": breakers,
+        "concurrency": fetcher.concurrency_states(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus 指标：各阶段耗时直方图、下载字节数、跳过图片数等"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 if __name__ == "__main__":
     # 启动服务器
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量抓取模式
+从 JSONL / 纯文本文件或标准输入读取文章链接，多线程并行处理，
+逐篇写入结果输出（见 result_sinks），并通过断点文件支持中断后续跑。
+"""
+
+import json
+import os
+import sys
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import config
+from wechat_article_scraper import WeChatArticleScraper
+
+logger = logging.getLogger(__name__)
+
+
+def iter_urls(source):
+    """
+    逐行读取文章链接
+
+    支持两种行格式：纯文本链接，或包含 ``url`` 字段的 JSON 对象。
+    空行与 ``#`` 开头的注释行会被忽略。
+
+    Args:
+        source (str): 输入文件路径，``-`` 表示标准输入
+
+    Yields:
+        str: 文章链接
+    """
+    stream = sys.stdin if source == '-' else open(source, 'r', encoding='utf-8')
+    try:
+        for line_no, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                try:
+                    url = json.loads(line).get('url')
+                except ValueError as e:
+                    logger.warning(f"第 {line_no} 行不是合法的JSON，已跳过: {e}")
+                    continue
+                if not url:
+                    logger.warning(f"第 {line_no} 行缺少 url 字段，已跳过")
+                    continue
+                yield url
+            else:
+                yield line
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+class Checkpoint:
+    """断点文件：每处理完成一篇文章追加一行链接"""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.done = {line.strip() for line in f if line.strip()}
+            logger.info(f"从断点文件恢复，已完成 {len(self.done)} 篇: {path}")
+        self._fh = open(path, 'a', encoding='utf-8') if path else None
+
+    def is_done(self, url):
+        return url in self.done
+
+    def mark_done(self, url):
+        with self._lock:
+            self.done.add(url)
+            if self._fh:
+                self._fh.write(url + '\n')
+                self._fh.flush()
+                os.fsync(self._fh.fileno())
+
+    def close(self):
+        if self._fh:
+            self._fh.close()
+
+
+class BatchRunner:
+    """批量文章处理器"""
+
+    def __init__(self, sink, checkpoint_path=None, workers=None, output_dir=None):
+        """
+        初始化批量处理器
+
+        Args:
+            sink (ResultSink): 结果输出
+            checkpoint_path (str): 断点文件路径，为空则不记录断点
+            workers (int): 并行工作线程数
+            output_dir (str): 图片下载根目录
+        """
+        self.sink = sink
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.workers = max(1, workers or config.BATCH_WORKERS)
+        # 抓取器可跨线程共享：会话按线程隔离，图片按文章写入独立工作目录
+        self.scraper = WeChatArticleScraper(output_dir=output_dir or config.OUTPUT_DIR)
+        self.stats = {'succeeded': 0, 'failed': 0, 'skipped': 0}
+
+    def _process_one(self, url):
+        try:
+            return url, self.scraper.process_article(url)
+        except Exception as e:
+            logger.error(f"处理文章异常 {url}: {e}")
+            return url, None
+
+    def _mark_durable(self, urls):
+        for url in urls:
+            self.checkpoint.mark_done(url)
+
+    def _record_result(self, url, article_info):
+        if article_info is None:
+            self.stats['failed'] += 1
+            logger.error(f"文章处理失败，续跑时将重试: {url}")
+            return
+        if article_info.get('partial'):
+            # 图片下载遇到反爬验证或熔断而提前停止，不写入结果与断点，续跑时重新处理整篇文章
+            self.stats['failed'] += 1
+            logger.error(f"文章有 {len(article_info.get('pending_images') or [])} 张图片未处理，续跑时将重试: {url}")
+            return
+        # 只有结果真正落盘后才写入断点
+        self._mark_durable(self.sink.write(article_info))
+        self.stats['succeeded'] += 1
+
+    def run(self, urls):
+        """
+        并行处理所有文章链接
+
+        已在断点文件中的链接会被跳过；在途任务数量受限，
+        因此即使输入上万条链接也不会一次性全部提交。
+
+        Args:
+            urls (iterable): 文章链接序列
+
+        Returns:
+            dict: 成功、失败与跳过的数量统计
+        """
+        max_in_flight = self.workers * 2
+        seen = set()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                pending = set()
+                for url in urls:
+                    if url in seen or self.checkpoint.is_done(url):
+                        self.stats['skipped'] += 1
+                        continue
+                    seen.add(url)
+                    pending.add(executor.submit(self._process_one, url))
+                    if len(pending) >= max_in_flight:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            self._record_result(*future.result())
+                for future in pending:
+                    self._record_result(*future.result())
+        finally:
+            self._mark_durable(self.sink.close())
+            self.checkpoint.close()
+
+        logger.info(
+            f"批量处理结束: 成功 {self.stats['succeeded']} 篇, "
+            f"失败 {self.stats['failed']} 篇, 跳过 {self.stats['skipped']} 篇"
+        )
+        return self.stats
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线性能基准测试
+在本地启动模拟的微信文章页面与图片CDN，按指定并发运行 process_article
+和 API 接口，输出吞吐（篇/秒、图片/秒）、延迟分位数（p50/p95/p99）
+与进程峰值内存，结果为 JSON 格式，便于比较不同版本的性能回归。
+
+用法：
+    python benchmark.py --articles 100 --images 4 --concurrency 8 --mode all --output bench.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import requests
+from PIL import Image, ImageDraw
+
+import config
+from wechat_article_scraper import WeChatArticleScraper
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+ARTICLE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head><title>基准测试文章 {n}</title></head>
+<body>
+<h1 class="rich_media_title" id="activity-name">基准测试文章 {n}</h1>
+<div class="rich_media_meta_list">
+  <a id="js_name">基准测试公众号</a>
+  <em id="publish_time">2024-01-01</em>
+</div>
+<div class="rich_media_content" id="js_content">
+{body}
+</div>
+</body>
+</html>
+"""
+
+
+def generate_text_images(count=4, size=(640, 240)):
+    """生成若干张带文字的PNG图片，返回字节串列表"""
+    images = []
+    for i in range(count):
+        image = Image.new('RGB', size, 'white')
+        draw = ImageDraw.Draw(image)
+        for line in range(6):
+            draw.text((20, 20 + line * 35), f"Benchmark image {i} line {line}: the quick brown fox", fill='black')
+        buf = BytesIO()
+        image.save(buf, format='PNG')
+        images.append(buf.getvalue())
+    return images
+
+
+class StandInServer:
+    """
+    本地模拟服务器
+    /s/<n>                 -> 第 n 篇文章页面
+    /mmbiz_png/<n>_<i>.png -> 第 n 篇文章的第 i 张图片
+    """
+
+    def __init__(self, images_per_article=4, paragraphs=30):
+        self.images_per_article = images_per_article
+        self.paragraphs = paragraphs
+        self.image_pool = generate_text_images()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def article_url(self, n):
+        return f"{self.base_url}/s/{n}"
+
+    def _article_html(self, n):
+        parts = []
+        for p in range(self.paragraphs):
+            parts.append(f"<p>第 {p + 1} 段：这是用于离线基准测试的模拟正文内容，文章编号 {n}。</p>")
+            if p < self.images_per_article:
+                parts.append(f'<img data-src="{self.base_url}/mmbiz_png/{n}_{p}.png" alt="图{p + 1}">')
+        return ARTICLE_TEMPLATE.format(n=n, body='\n'.join(parts)).encode('utf-8')
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                if self.path.startswith('/s/'):
+                    body = server._article_html(self.path[3:])
+                    content_type = 'text/html; charset=utf-8'
+                elif self.path.startswith('/mmbiz_png/'):
+                    name = self.path.rsplit('/', 1)[-1].split('.')[0]
+                    index = sum(int(x) for x in name.split('_') if x.isdigit())
+                    body = server.image_pool[index % len(server.image_pool)]
+                    content_type = 'image/png'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def percentile(sorted_values, pct):
+    """最近秩法计算分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def peak_rss_mb():
+    """进程峰值常驻内存（MB），平台不支持时返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(peak / divisor, 1)
+
+
+def run_load(name, urls, concurrency, worker):
+    """
+    按指定并发执行 worker(url)，worker 返回该篇文章的 OCR 结果列表，失败返回 None
+
+    OCR 失败的图片（如未安装 Tesseract）计入 ocr_failures，不计入 images，
+    避免在没有 OCR 能力的环境中报告虚高的图片吞吐。
+
+    Returns:
+        dict: 吞吐、延迟分位数与峰值内存
+    """
+    latencies = []
+    images = 0
+    ocr_failures = 0
+    errors = 0
+    lock = threading.Lock()
+
+    def timed(url):
+        nonlocal images, ocr_failures, errors
+        start = time.perf_counter()
+        try:
+            ocr_results = worker(url)
+        except Exception as e:
+            logger.error(f"[{name}] 处理失败 {url}: {e}")
+            ocr_results = None
+        elapsed = time.perf_counter() - start
+        failed = sum(1 for result in ocr_results or [] if result['ocr_text'].startswith("OCR识别失败"))
+        with lock:
+            latencies.append(elapsed)
+            if ocr_results is None:
+                errors += 1
+            else:
+                images += len(ocr_results) - failed
+                ocr_failures += failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, urls))
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    completed = len(urls) - errors
+    if ocr_failures:
+        logger.warning(f"[{name}] {ocr_failures} 张图片OCR失败（未计入 images），请检查 Tesseract 是否可用")
+    return {
+        'mode': name,
+        'concurrency': concurrency,
+        'articles': completed,
+        'errors': errors,
+        'images': images,
+        'ocr_failures': ocr_failures,
+        'duration_s': round(duration, 3),
+        'articles_per_sec': round(completed / duration, 3) if duration else 0.0,
+        'images_per_sec': round(images / duration, 3) if duration else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50) * 1000, 2),
+            'p95': round(percentile(latencies, 95) * 1000, 2),
+            'p99': round(percentile(latencies, 99) * 1000, 2),
+            'mean': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        },
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def bench_scraper(urls, concurrency, output_dir, with_images):
+    """直接调用 process_article，所有线程共享同一个抓取器"""
+    scraper = WeChatArticleScraper(output_dir=output_dir)
+
+    def worker(url):
+        article_info = scraper.process_article(url, with_images=with_images, delay=0)
+        if article_info is None:
+            return None
+        return article_info['ocr_results']
+
+    return run_load('scraper', urls, concurrency, worker)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def bench_api(urls, concurrency, with_images):
+    """在后台线程启动 uvicorn，通过 HTTP 并发请求 /article/info"""
+    import uvicorn
+    import api_server
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(api_server.app, host='127.0.0.1', port=port, log_level='warning'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 10
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("API 服务启动超时")
+        time.sleep(0.05)
+
+    endpoint = f"http://127.0.0.1:{port}/article/info"
+    local = threading.local()
+
+    def worker(url):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        resp = session.get(endpoint, params={
+            'url': url,
+            'download_images': with_images,
+            'include_ocr': with_images,
+        }, timeout=300)
+        if resp.status_code != 200:
+            return None
+        return resp.json()['data']['ocr_results']
+
+    try:
+        return run_load('api', urls, concurrency, worker)
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="微信公众号文章抓取器离线性能基准测试")
+    parser.add_argument('--mode', choices=['scraper', 'api', 'all'], default='all', help="测试对象")
+    parser.add_argument('--articles', type=int, default=50, help="每种模式处理的文章数")
+    parser.add_argument('--images', type=int, default=4, help="每篇文章的图片数")
+    parser.add_argument('--concurrency', type=int, default=4, help="并发数")
+    parser.add_argument('--no-images', action='store_true', help="只测试页面抓取与解析，不下载图片、不做OCR")
+    parser.add_argument('--cache', action='store_true',
+                        help="启用共享缓存（使用临时缓存文件；--mode all 时 api 阶段会命中 scraper 阶段写入的缓存）")
+    parser.add_argument('--index', action='store_true', help="启用全文索引（写入临时索引文件），把索引耗时计入测量结果")
+    parser.add_argument('--output', '-o', help="结果输出文件（JSON），为空则输出到标准输出")
+    parser.add_argument('--verbose', '-v', action='store_true', help="输出抓取器日志")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    work_dir = tempfile.mkdtemp(prefix='wechat_bench_')
+    # api_server 在首个请求时（get_scraper）按 OUTPUT_DIR 创建全局抓取器，需在启动 API 前指向临时目录
+    config.OUTPUT_DIR = os.path.join(work_dir, 'api')
+    # 默认关闭共享缓存，避免历史缓存影响测量结果
+    config.CACHE_ENABLED = args.cache
+    config.CACHE_PATH = os.path.join(work_dir, 'cache.db')
+    # 默认关闭全文索引；启用时写入临时文件，模拟文章不会进入正式索引
+    config.SEARCH_INDEX_ENABLED = args.index
+    config.SEARCH_INDEX_PATH = os.path.join(work_dir, 'search.db')
+    # OCR 主机槽位文件同样放在临时目录，不在调用方的工作目录下创建 cache/
+    config.OCR_SLOT_DIR = os.path.join(work_dir, 'ocr_slots')
+    server = StandInServer(images_per_article=args.images).start()
+    with_images = not args.no_images
+    results = []
+    try:
+        urls = [server.article_url(n) for n in range(args.articles)]
+        if args.mode in ('scraper', 'all'):
+            results.append(bench_scraper(urls, args.concurrency, os.path.join(work_dir, 'scraper'), with_images))
+        if args.mode in ('api', 'all'):
+            results.append(bench_api(urls, args.concurrency, with_images))
+    finally:
+        server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'python': sys.version.split()[0],
+        'config': {
+            'articles': args.articles,
+            'images_per_article': args.images if with_images else 0,
+            'concurrency': args.concurrency,
+            'cache': args.cache,
+            'index': args.index,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
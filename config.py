@@ -12,7 +12,7 @@ ARTICLE_URL = "https://mp.weixin.qq.com/s/brQ_pc6w_FNomWJdi3iXDA"
 OUTPUT_DIR = "downloaded_images"
 
 # 网络请求配置
-REQUEST_TIMEOUT = 30  # 请求超时时间（秒）
+REQUEST_TIMEOUT = 30  # 请求超时时间（秒），同时作为读取超时
 REQUEST_DELAY = 1     # 请求间隔延迟（秒）
 MAX_RETRIES = 3       # 最大重试次数
 
@@ -85,4 +85,95 @@ FEISHU_FIELDS = {
     'content': '正文',
     'read_count': '阅读量',
     'publish_date': '发布日期',
-} 
\ No newline at end of file
+} 
+
+# ================== 批量抓取配置 ==================
+BATCH_WORKERS = 4                              # 并行处理文章的工作线程数
+BATCH_OUTPUT_FILE = "batch_results.jsonl"      # 批量结果输出文件（逐篇追加写入）
+BATCH_CHECKPOINT_FILE = "batch_checkpoint.txt" # 断点文件，记录已处理完成的文章链接
+BATCH_OUTPUT_FORMAT = None                     # 输出格式：'jsonl' / 'parquet'，None 表示按扩展名推断
+PARQUET_ROW_GROUP_SIZE = 500                   # Parquet 每个分片文件累积的文章数
+
+# ================== 图片工作目录配置 ==================
+# 每篇文章的图片下载到 OUTPUT_DIR 下独立的工作目录，并发请求互不覆盖
+# 'article'：同一篇文章共用目录（按链接哈希命名，多个请求/进程可复用）
+# 'request'：每次处理使用全新目录（按链接哈希 + 随机后缀命名）
+IMAGE_WORKSPACE_MODE = 'article'
+# 清理策略：'keep' 保留；'after_request' 处理结束后立即删除（此时总是按 'request' 模式使用独立目录）；'ttl' 定期删除超过 IMAGE_WORKSPACE_TTL 未使用的目录
+IMAGE_CLEANUP_POLICY = 'keep'
+IMAGE_WORKSPACE_TTL = 24 * 3600  # 工作目录保留时长（秒），仅 'ttl' 策略生效
+# 图片存储格式：'files' 每张图片一个文件；'pack' 每篇文章的图片追加写入一个 pack 文件（附偏移索引，mmap 读取）
+IMAGE_STORAGE = 'files'
+IMAGE_PACK_COMPACT_MIN_WASTE = 0.2  # --compact-images 只压缩失效数据占比不低于该值的 pack
+
+# ================== API 时间预算配置 ==================
+# 单次请求的默认时间预算（秒），None 表示不限时；请求可通过 time_budget 参数覆盖
+API_DEFAULT_TIME_BUDGET = None
+
+# ================== OCR 调度配置 ==================
+OCR_WORKERS = 4                     # 每个进程同时运行的 Tesseract 进程数
+OCR_INTERACTIVE_RESERVED = 1        # 仅供交互请求（API）使用的 OCR 工作线程数
+OCR_MAX_QUEUE = {                   # 各优先级最大排队任务数，批量任务队列满时阻塞等待
+    'interactive': 100,
+    'bulk': 1000,
+}
+OCR_INTERACTIVE_SUBMIT_TIMEOUT = 2  # 交互请求在OCR队列满时最多等待的秒数，超时返回503
+# 同一主机上 API、批量模式与 worker 进程合计的 OCR 并发数（主机级槽位），None 表示取 OCR_WORKERS，0 表示不限制
+# OCR_INTERACTIVE_RESERVED 个槽位只供交互请求使用；同一主机上的所有进程需使用相同的 OCR_SLOT_DIR
+OCR_HOST_SLOTS = None
+OCR_SLOT_DIR = "cache/ocr_slots"
+
+# ================== 任务队列配置 ==================
+# 任务队列地址：sqlite:///path/to/tasks.db（默认，单机）或 redis://host:6379/0（多主机）
+TASK_QUEUE_URL = "sqlite:///task_queue.db"
+TASK_LEASE_SECONDS = 300   # 任务租约时长（秒），worker 崩溃后最多经过该时长任务会被重新领取
+TASK_MAX_ATTEMPTS = 3      # 每个任务的最大尝试次数
+TASK_POLL_INTERVAL = 2     # 队列为空时 worker 的轮询间隔（秒）
+
+# ================== 共享缓存配置 ==================
+# 同一主机上的多个进程（如 uvicorn --workers N）共用的缓存，避免重复抓取与重复OCR
+CACHE_ENABLED = True
+CACHE_PATH = "cache/shared_cache.db"
+CACHE_ARTICLE_TTL = 3600        # 文章解析结果缓存时长（秒）
+CACHE_IMAGE_TTL = 7 * 24 * 3600 # 图片内容缓存时长（秒）
+CACHE_OCR_TTL = None            # OCR结果缓存时长（秒），按图片内容哈希缓存，None 表示永不过期
+CACHE_LOCK_TIMEOUT = 120        # 计算锁最长持有时间（秒），持有进程崩溃后其他进程在此之后接管
+CACHE_MAX_BYTES = 1024 * 1024 * 1024  # 缓存总大小上限（字节），超出时淘汰最久未访问的条目，None 表示不限制
+
+# ================== 网络请求配置 ==================
+CONNECT_TIMEOUT = 5               # 建立连接超时（秒），主机不可达时尽快失败
+READ_TIMEOUT = REQUEST_TIMEOUT    # 读取响应超时（秒）
+RETRY_BACKOFF_BASE = 0.5          # 重试退避基数（秒），第 n 次重试前随机等待 0 ~ base * 2^n 秒
+RETRY_BACKOFF_MAX = 8             # 单次退避等待上限（秒）
+RETRY_AFTER_MAX = 30              # 服务端 Retry-After 的采用上限（秒），更长的等待交给自适应并发降速
+BREAKER_FAILURE_THRESHOLD = 5     # 同一主机连续失败多少次后熔断
+BREAKER_RESET_TIMEOUT = 30        # 熔断持续时长（秒），到期后放行一个探测请求
+
+# ================== 自适应并发配置 ==================
+# 按主机自动调整同时进行的请求数：请求顺利时逐步提高上限，遇到限流（429/503）或反爬验证页时成倍降低。
+# 批量模式的 --workers 只是线程数上限，实际请求并发由此控制
+ADAPTIVE_CONCURRENCY_ENABLED = True
+ADAPTIVE_CONCURRENCY_INITIAL = 4    # 每个主机的初始并发上限
+ADAPTIVE_CONCURRENCY_MIN = 1        # 并发上限下界
+ADAPTIVE_CONCURRENCY_MAX = 32       # 并发上限上界
+ADAPTIVE_DECREASE_FACTOR = 0.5      # 遇到限流时并发上限乘以该系数
+ADAPTIVE_DECREASE_COOLDOWN = 5      # 两次降低并发上限的最小间隔（秒），避免同一波限流被重复计算
+
+# ================== API 响应压缩配置 ==================
+# 'gzip'；'br' 使用 brotli（需 pip install brotli-asgi，客户端不支持时回退为 gzip）；None 不压缩
+API_COMPRESSION = 'gzip'
+API_COMPRESSION_MIN_SIZE = 1024   # 小于该字节数的响应不压缩
+
+# ================== 全文检索配置 ==================
+# 处理过的文章（标题、公众号名称、正文、OCR文本）写入本地 SQLite FTS5 索引，通过 /search 接口检索
+SEARCH_INDEX_ENABLED = True
+SEARCH_INDEX_PATH = "search_index.db"
+SEARCH_MAX_LIMIT = 100   # /search 单次最多返回的条数
+
+# ================== 性能分析配置 ==================
+# 开启后，带请求头 X-Profile 或查询参数 profile 的 API 请求会被单独分析（cprofile / sample）
+PROFILING_ENABLED = False
+PROFILE_DIR = "profiles"            # 分析结果保存目录
+PROFILE_DEFAULT_MODE = 'cprofile'   # X-Profile: 1 时使用的模式
+PROFILE_SAMPLE_INTERVAL = 0.005     # sample 模式的采样间隔（秒）
+PROFILE_MAX_FILES = 200             # 最多保留的分析结果文件数
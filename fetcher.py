@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+网络请求层
+文章页面与图片下载共用：
+1. 带随机抖动的指数退避重试（网络错误、5xx、429）
+2. 连接超时与读取超时分开配置，并受时间预算约束
+3. 按主机的熔断器：某个主机连续失败后快速失败，一段时间后放行一个探测请求
+4. 按主机的自适应并发（AIMD）：请求顺利时逐步提高并发上限，
+   遇到限流（429/503）或反爬验证页时成倍降低
+"""
+
+import random
+import re
+import threading
+import time
+import logging
+from urllib.parse import urlparse
+
+import requests
+
+import config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """主机熔断中，请求未发出"""
+
+
+class RetryableHTTPError(requests.HTTPError):
+    """可重试的 HTTP 错误状态（5xx / 429）"""
+
+
+class BlockedError(requests.RequestException):
+    """返回了反爬验证页或访问受限页面，重试只会加重限制"""
+
+
+# 验证页特有的结构特征（验证接口路径、验证按钮）
+BLOCK_SIGNATURES = (
+    'wappoc_appmsgcaptcha',
+    'id="js_verify"',
+)
+# 验证页 / 访问受限页面的提示文字，正文中也可能出现
+BLOCK_MARKERS = (
+    '环境异常',
+    '完成验证后即可继续访问',
+    '访问过于频繁',
+    '操作频繁',
+)
+# 文章正文容器，验证页中没有
+_ARTICLE_CONTENT_RE = re.compile(rb'id=["\']js_content["\']')
+
+# 视为限流信号的 HTTP 状态码
+THROTTLE_STATUS = (429, 503)
+
+
+def detect_block(response):
+    """
+    检查响应是否为反爬验证页或访问受限页面
+
+    跳转到验证地址的响应直接视为验证页；包含文章正文容器的页面是正常文章，
+    即使标题或正文中提到“环境异常”“操作频繁”等字样也不视为验证页；
+    其余页面按验证页的结构特征与提示文字判断。
+
+    Returns:
+        str: 命中的特征，未命中返回 None
+    """
+    if 'captcha' in urlparse(response.url).path:
+        return response.url
+    if 'html' not in response.headers.get('Content-Type', ''):
+        return None
+    if _ARTICLE_CONTENT_RE.search(response.content):
+        return None
+    # 验证页很短，只检查开头部分即可
+    text = response.content[:16384].decode('utf-8', errors='ignore')
+    for marker in BLOCK_SIGNATURES + BLOCK_MARKERS:
+        if marker in text:
+            return marker
+    return None
+
+
+class AdaptiveLimiter:
+    """单个主机的自适应并发上限（加性增、乘性减）"""
+
+    def __init__(self, host, initial=None, minimum=None, maximum=None):
+        self.host = host
+        self.minimum = max(1, minimum or config.ADAPTIVE_CONCURRENCY_MIN)
+        self.maximum = max(self.minimum, maximum or config.ADAPTIVE_CONCURRENCY_MAX)
+        self.limit = float(min(self.maximum, max(self.minimum, initial or config.ADAPTIVE_CONCURRENCY_INITIAL)))
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout=None):
+        """
+        等待并发配额
+
+        Returns:
+            bool: 是否在 timeout 秒内获得配额
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                remaining = None if end is None else end - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self.in_flight += 1
+            return True
+
+    def release(self, throttled=None):
+        """
+        归还配额并根据本次请求的结果调整上限
+
+        Args:
+            throttled (bool): True 表示遇到限流，False 表示请求顺利，None 表示不调整
+        """
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                now = time.monotonic()
+                # 同一时刻在途的请求可能同时收到限流，冷却期内只降低一次
+                if now - self._last_decrease >= config.ADAPTIVE_DECREASE_COOLDOWN:
+                    self._last_decrease = now
+                    old = self.limit
+                    self.limit = max(self.minimum, self.limit * config.ADAPTIVE_DECREASE_FACTOR)
+                    logger.warning(f"主机限流，并发上限 {old:.1f} -> {self.limit:.1f}: {self.host}")
+            elif throttled is False:
+                # 每完成约一个并发窗口的请求，上限加一
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def snapshot(self):
+        with self._cond:
+            return {'limit': int(self.limit), 'in_flight': self.in_flight}
+
+
+class CircuitBreaker:
+    """单个主机的熔断器"""
+
+    def __init__(self, host, failure_threshold=None, reset_timeout=None):
+        self.host = host
+        self.failure_threshold = failure_threshold or config.BREAKER_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or config.BREAKER_RESET_TIMEOUT
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+        self._probe_thread = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """是否允许发出请求；熔断到期后只放行一个探测请求"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self._probe_thread = threading.get_ident()
+                return True
+            return False
+
+    def release_probe(self):
+        """探测请求未得出结果（如等待并发配额超时、意外异常）时归还探测名额，由下一个请求重新探测"""
+        with self._lock:
+            if (self.state == HALF_OPEN and self._probe_in_flight
+                    and self._probe_thread == threading.get_ident()):
+                self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"主机恢复，关闭熔断: {self.host}")
+            self.state = CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning(f"主机连续失败 {self.failures} 次，熔断 {self.reset_timeout} 秒: {self.host}")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def snapshot(self):
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = round(max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at)), 1)
+            return {'state': self.state, 'failures': self.failures, 'retry_in': retry_in}
+
+
+_breakers = {}
+_limiters = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(host):
+    """进程内按主机共享的熔断器"""
+    breaker = _breakers.get(host)
+    if breaker is None:
+        with _registry_lock:
+            breaker = _breakers.setdefault(host, CircuitBreaker(host))
+    return breaker
+
+
+def get_limiter(host):
+    """进程内按主机共享的并发限制器"""
+    limiter = _limiters.get(host)
+    if limiter is None:
+        with _registry_lock:
+            limiter = _limiters.setdefault(host, AdaptiveLimiter(host))
+    return limiter
+
+
+def breaker_states():
+    """所有主机的熔断器状态，用于 /health"""
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return {breaker.host: breaker.snapshot() for breaker in breakers}
+
+
+def concurrency_states():
+    """所有主机当前的并发上限与在途请求数，用于 /health"""
+    with _registry_lock:
+        limiters = list(_limiters.values())
+    return {limiter.host: limiter.snapshot() for limiter in limiters}
+
+
+def _backoff(attempt, response=None):
+    """
+    第 attempt 次重试前的等待时间（full jitter 指数退避）
+
+    服务端给出 Retry-After 时不少于该值，但不超过 config.RETRY_AFTER_MAX，
+    避免异常或恶意的响应头让工作线程长时间空等
+    """
+    cap = min(config.RETRY_BACKOFF_MAX, config.RETRY_BACKOFF_BASE * (2 ** attempt))
+    wait = random.uniform(0, cap)
+    retry_after = response.headers.get('Retry-After', '') if response is not None else ''
+    if retry_after.isdigit():
+        wait = max(wait, min(float(retry_after), config.RETRY_AFTER_MAX))
+    return wait
+
+
+def _send(session, url, headers, timeout, host, limiter):
+    """发出一次请求并检查限流与反爬信号，结束后按结果调整主机并发上限"""
+    throttled = None
+    try:
+        response = session.get(url, headers=headers, timeout=timeout)
+        if response.status_code in THROTTLE_STATUS:
+            throttled = True
+            metrics.THROTTLE_EVENTS.inc(host=host, reason=f"http_{response.status_code}")
+        if response.status_code >= 500 or response.status_code == 429:
+            raise RetryableHTTPError(f"{response.status_code} Error for url: {url}", response=response)
+        response.raise_for_status()
+        marker = detect_block(response)
+        if marker:
+            throttled = True
+            metrics.THROTTLE_EVENTS.inc(host=host, reason='blocked')
+            raise BlockedError(f"触发反爬验证（{marker}），放弃请求: {url}", response=response)
+        throttled = False
+        return response
+    finally:
+        if limiter:
+            limiter.release(throttled)
+
+
+def fetch(session, url, headers=None, deadline=None, max_retries=None):
+    """
+    发起 GET 请求
+
+    Args:
+        session (requests.Session): 使用的会话
+        url (str): 请求地址
+        headers (dict): 请求头
+        deadline: 时间预算（提供 remaining() 方法），为空表示不限时
+        max_retries (int): 最大重试次数，默认 config.MAX_RETRIES
+
+    Returns:
+        requests.Response: 状态码为 2xx/3xx 的响应
+
+    Raises:
+        CircuitOpenError: 主机熔断中
+        BlockedError: 返回了反爬验证页，不会重试
+        requests.RequestException: 重试用尽后仍然失败，或不可重试的错误（如 404）
+    """
+    host = urlparse(url).netloc
+    breaker = get_breaker(host)
+    limiter = get_limiter(host) if config.ADAPTIVE_CONCURRENCY_ENABLED else None
+    max_retries = config.MAX_RETRIES if max_retries is None else max_retries
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            metrics.BREAKER_REJECTIONS.inc(host=host)
+            raise CircuitOpenError(f"主机熔断中，暂停请求: {host}")
+
+        remaining = deadline.remaining() if deadline else None
+        if limiter and not limiter.acquire(remaining):
+            breaker.release_probe()
+            raise requests.Timeout(f"等待并发配额超出时间预算: {host}")
+        remaining = deadline.remaining() if deadline else None
+        connect_timeout, read_timeout = config.CONNECT_TIMEOUT, config.READ_TIMEOUT
+        if remaining is not None:
+            connect_timeout = min(connect_timeout, remaining)
+            read_timeout = min(read_timeout, remaining)
+
+        try:
+            response = _send(session, url, headers, (connect_timeout, read_timeout), host, limiter)
+        except BlockedError:
+            # 限流由并发限制器处理，熔断器只关心主机是否可用
+            breaker.record_success()
+            raise
+        except (requests.ConnectionError, requests.Timeout, RetryableHTTPError) as e:
+            if e.response is not None and e.response.status_code == 429:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+            remaining = deadline.remaining() if deadline else None
+            wait = _backoff(attempt, e.response)
+            if (attempt >= max_retries or breaker.state == OPEN
+                    or (remaining is not None and remaining <= wait)):
+                raise
+            attempt += 1
+            metrics.FETCH_RETRIES.inc(host=host)
+            logger.warning(f"请求失败，{wait:.2f} 秒后第 {attempt} 次重试 {url}: {e}")
+            time.sleep(wait)
+            continue
+        except requests.HTTPError:
+            # 4xx 说明请求本身有问题，主机是健康的
+            breaker.record_success()
+            raise
+        except BaseException:
+            # 其他异常（如 ChunkedEncodingError、TooManyRedirects、超时为0时 urllib3 的 ValueError）
+            # 说明不了主机是否可用，归还探测名额，避免熔断器一直等待探测结果
+            breaker.release_probe()
+            raise
+        breaker.record_success()
+        return response
@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片打包存储
+IMAGE_STORAGE = 'pack' 时，每篇文章的图片不再写成目录下的零散文件，而是追加写入一个 pack 文件：
+
+    <OUTPUT_DIR>/<文章哈希>.pack   图片数据，只追加
+    <OUTPUT_DIR>/<文章哈希>.idx    偏移索引：图片名 -> (偏移, 长度, CRC32)
+
+读取时通过 mmap 直接引用 pack 中的数据，OCR 与 API 不需要逐个打开小文件。
+pack 中每条记录自带文件名和长度，索引丢失或与 pack 不一致时可从 pack 重建。
+覆盖或删除的图片在 pack 中留下失效数据，由 compact 回收。
+
+compact 以新文件替换 pack。每个实例持有加载索引时打开的 pack 文件，读取与 mmap 都基于该文件，
+偏移与数据始终来自同一个文件；读取前发现 pack 已被其他进程替换时重新加载。
+
+图片以 "<pack 路径>#<图片名>" 形式引用，read_image 同时支持该引用与普通文件路径。
+"""
+
+import errno
+import mmap
+import os
+import struct
+import threading
+import zlib
+import logging
+from collections import OrderedDict, namedtuple
+
+try:
+    import fcntl
+except ImportError:  # Windows 下只能保证进程内的写入互斥
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+PACK_SUFFIX = '.pack'
+INDEX_SUFFIX = '.idx'
+
+_PACK_MAGIC = b'WXIMGPK1'
+_INDEX_MAGIC = b'WXIMGIX1'
+# 文件头：魔数 + 8 字节代号，pack 与索引的代号一致才说明索引属于当前 pack
+_HEADER_SIZE = 16
+# pack 记录头：文件名长度、数据长度
+_RECORD = struct.Struct('<HI')
+# 索引记录：数据偏移、数据长度、CRC32、文件名长度
+_INDEX_RECORD = struct.Struct('<QIIH')
+# 数据长度为该值的记录表示删除
+_TOMBSTONE = 0xFFFFFFFF
+
+# 进程内同时保持打开（mmap）的 pack 数
+MAX_OPEN_PACKS = 128
+
+Entry = namedtuple('Entry', ['offset', 'length', 'crc'])
+
+
+def is_pack(path):
+    """路径是否为 pack 文件"""
+    return bool(path) and path.endswith(PACK_SUFFIX)
+
+
+def pack_ref(pack_path, name):
+    """pack 中图片的引用路径"""
+    return f"{pack_path}#{name}"
+
+
+def split_ref(path):
+    """
+    拆分图片引用
+
+    Returns:
+        tuple: (pack 路径, 图片名)；普通文件路径返回 (None, None)
+    """
+    pack_path, sep, name = path.rpartition('#')
+    if sep and is_pack(pack_path):
+        return pack_path, name
+    return None, None
+
+
+class ImagePack:
+    """单篇文章的图片 pack 文件"""
+
+    def __init__(self, path, create=True):
+        """
+        Args:
+            path (str): pack 文件路径（以 .pack 结尾）
+            create (bool): 文件不存在时是否创建，为 False 时抛出 FileNotFoundError
+        """
+        self.path = path
+        self.index_path = path[:-len(PACK_SUFFIX)] + INDEX_SUFFIX
+        self._lock = threading.RLock()
+        self._file = None
+        self._index_file = None
+        self._mmap = None
+        if not create and not os.path.exists(path):
+            raise FileNotFoundError(errno.ENOENT, "图片 pack 不存在", path)
+        # 文件不存在或其他进程刚创建、尚未写入文件头时，在写锁内创建（或等待写完）文件头
+        if not os.path.exists(path) or os.path.getsize(path) < _HEADER_SIZE:
+            with self._write_lock():
+                pass
+        self._load()
+
+    # ---------- 加载 ----------
+
+    def _load(self):
+        """打开 pack 并读取索引；索引缺失或不属于当前 pack 时从 pack 重建"""
+        with self._lock:
+            self._close_files()
+            self._entries = {}
+            # 之后的偏移、扫描与 mmap 都基于这个文件，即使 pack 随后被替换也保持一致
+            self._file = open(self.path, 'rb')
+            header = self._file.read(_HEADER_SIZE)
+            self._inode = os.fstat(self._file.fileno()).st_ino
+            if header[:8] != _PACK_MAGIC:
+                raise ValueError(f"不是有效的图片 pack 文件: {self.path}")
+            self._generation = header[8:]
+            self._index_pos = _HEADER_SIZE
+            self._pack_pos = _HEADER_SIZE
+            try:
+                self._index_file = open(self.index_path, 'rb')
+                index_header = self._index_file.read(_HEADER_SIZE)
+                self._index_inode = os.fstat(self._index_file.fileno()).st_ino
+            except FileNotFoundError:
+                index_header = b''
+                self._index_inode = None
+            if index_header != _INDEX_MAGIC + self._generation:
+                if index_header:
+                    logger.warning(f"图片索引与 pack 不一致，从 pack 重建: {self.index_path}")
+                self._index_pos = None
+            self._refresh()
+
+    def _close_files(self):
+        # 旧的映射可能仍被调用方持有的 memoryview 引用，不主动关闭，随引用释放（mmap 自行持有文件）
+        self._mmap = None
+        for f in (self._file, self._index_file):
+            if f is not None:
+                f.close()
+        self._file = self._index_file = None
+
+    def _replaced(self):
+        """pack 是否已被其他实例或进程替换（如 compact）"""
+        try:
+            return os.stat(self.path).st_ino != self._inode
+        except FileNotFoundError:
+            # pack 已被删除，已打开的文件仍可读取
+            return False
+
+    def _refresh(self):
+        """读取其他线程/进程新追加的记录；pack 或索引被其他进程替换时重新加载"""
+        with self._lock:
+            try:
+                inode = os.stat(self.path).st_ino
+            except FileNotFoundError:
+                return
+            try:
+                index_inode = os.stat(self.index_path).st_ino
+            except FileNotFoundError:
+                index_inode = None
+            if inode != self._inode or index_inode != self._index_inode:
+                self._load()
+                return
+            if self._index_pos is not None:
+                self._read_index_tail()
+            self._scan_pack_tail()
+
+    def _read_index_tail(self):
+        try:
+            f = self._index_file
+            if os.fstat(f.fileno()).st_size < self._index_pos:
+                raise ValueError("索引文件被截断")
+            f.seek(self._index_pos)
+            data = f.read()
+            pos = 0
+            while pos + _INDEX_RECORD.size <= len(data):
+                offset, length, crc, name_len = _INDEX_RECORD.unpack_from(data, pos)
+                end = pos + _INDEX_RECORD.size + name_len
+                if end > len(data):
+                    break
+                name = data[pos + _INDEX_RECORD.size:end].decode('utf-8')
+                self._apply(name, offset, length, crc)
+                pos = end
+            self._index_pos += pos
+        except (OSError, ValueError) as e:
+            # 索引被外部删除或改写：改为扫描 pack，下次写入时重建索引
+            logger.warning(f"图片索引不可用，从 pack 重建: {self.index_path}: {e}")
+            self._entries = {}
+            self._pack_pos = _HEADER_SIZE
+            self._index_pos = None
+
+    def _scan_pack_tail(self):
+        """扫描索引未覆盖的 pack 记录（写入索引前中断，或正在从 pack 重建索引）"""
+        f = self._file
+        size = os.fstat(f.fileno()).st_size
+        if size <= self._pack_pos:
+            return
+        f.seek(self._pack_pos)
+        while True:
+            head = f.read(_RECORD.size)
+            if len(head) < _RECORD.size:
+                break
+            name_len, length = _RECORD.unpack(head)
+            name = f.read(name_len)
+            if len(name) < name_len:
+                break
+            offset = f.tell()
+            if length == _TOMBSTONE:
+                self._apply(name.decode('utf-8'), offset, _TOMBSTONE, 0)
+                continue
+            if offset + length > size:
+                # 其他进程正在写入的记录
+                break
+            crc = zlib.crc32(f.read(length))
+            self._apply(name.decode('utf-8'), offset, length, crc)
+
+    def _apply(self, name, offset, length, crc):
+        if length == _TOMBSTONE:
+            self._entries.pop(name, None)
+            self._pack_pos = max(self._pack_pos, offset)
+        else:
+            self._entries[name] = Entry(offset, length, crc)
+            self._pack_pos = max(self._pack_pos, offset + length)
+
+    # ---------- 写入 ----------
+
+    def _write_lock(self):
+        return _PackWriteLock(self)
+
+    def _append(self, name, data):
+        """追加一条记录到 pack 与索引，调用方需持有写锁"""
+        encoded = name.encode('utf-8')
+        length = _TOMBSTONE if data is None else len(data)
+        with open(self.path, 'ab') as f:
+            f.seek(0, os.SEEK_END)
+            offset = f.tell() + _RECORD.size + len(encoded)
+            f.write(_RECORD.pack(len(encoded), length) + encoded)
+            if data is not None:
+                f.write(data)
+        crc = 0 if data is None else zlib.crc32(data)
+        if self._index_pos is None:
+            self._rebuild_index()
+        with open(self.index_path, 'ab') as f:
+            f.write(_INDEX_RECORD.pack(offset, length, crc, len(encoded)) + encoded)
+        self._refresh()
+
+    def _rebuild_index(self):
+        """按当前条目重写索引文件，调用方需持有写锁"""
+        records = [_INDEX_MAGIC + self._generation]
+        for name, entry in self._entries.items():
+            encoded = name.encode('utf-8')
+            records.append(_INDEX_RECORD.pack(entry.offset, entry.length, entry.crc, len(encoded)) + encoded)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(b''.join(records))
+        os.replace(tmp_path, self.index_path)
+        if self._index_file is not None:
+            self._index_file.close()
+        self._index_file = open(self.index_path, 'rb')
+        stat = os.fstat(self._index_file.fileno())
+        self._index_pos = stat.st_size
+        self._index_inode = stat.st_ino
+
+    def put(self, name, data):
+        """
+        写入图片，同名且内容相同的图片不重复写入
+
+        Args:
+            name (str): 图片名（如 image_1.png）
+            data (bytes): 图片内容
+
+        Returns:
+            str: 图片引用路径
+        """
+        with self._write_lock():
+            entry = self._entries.get(name)
+            if entry is None or entry.length != len(data) or entry.crc != zlib.crc32(data):
+                self._append(name, data)
+        return pack_ref(self.path, name)
+
+    def delete(self, name):
+        """删除图片，占用的空间在 compact 时回收"""
+        with self._write_lock():
+            if name in self._entries:
+                self._append(name, None)
+
+    def compact(self):
+        """
+        重写 pack，只保留有效图片
+
+        Returns:
+            int: 回收的字节数
+        """
+        with self._write_lock():
+            before = os.fstat(self._file.fileno()).st_size
+            generation = os.urandom(8)
+            tmp_pack = f"{self.path}.tmp"
+            tmp_index = f"{self.index_path}.compact.tmp"
+            view = self._view(before)
+            with open(tmp_pack, 'wb') as pack, open(tmp_index, 'wb') as index:
+                pack.write(_PACK_MAGIC + generation)
+                index.write(_INDEX_MAGIC + generation)
+                for name, entry in self._entries.items():
+                    encoded = name.encode('utf-8')
+                    pack.write(_RECORD.pack(len(encoded), entry.length) + encoded)
+                    offset = pack.tell()
+                    pack.write(view[entry.offset:entry.offset + entry.length])
+                    index.write(_INDEX_RECORD.pack(offset, entry.length, entry.crc, len(encoded)) + encoded)
+            del view
+            # 先替换 pack 再替换索引：中途中断时索引代号不一致，下次打开会从 pack 重建
+            os.replace(tmp_pack, self.path)
+            os.replace(tmp_index, self.index_path)
+            self._load()
+            return before - os.path.getsize(self.path)
+
+    # ---------- 读取 ----------
+
+    def _view(self, needed=0):
+        """覆盖至少 needed 字节的只读 mmap，映射的是加载索引时打开的 pack 文件"""
+        with self._lock:
+            if self._mmap is None or len(self._mmap) < needed:
+                # 旧的映射可能仍被调用方持有的 memoryview 引用，不主动关闭，随引用释放
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            return memoryview(self._mmap)
+
+    def get(self, name):
+        """
+        读取图片
+
+        Returns:
+            memoryview: 指向 mmap 的只读视图，不复制数据
+
+        Raises:
+            KeyError: 图片不存在
+        """
+        with self._lock:
+            if self._replaced():
+                self._load()
+            entry = self._entries.get(name)
+            if entry is None:
+                self._refresh()
+                entry = self._entries.get(name)
+            if entry is None:
+                raise KeyError(f"pack 中不存在图片 {name}: {self.path}")
+            return self._view(entry.offset + entry.length)[entry.offset:entry.offset + entry.length]
+
+    def names(self):
+        """pack 中的图片名"""
+        with self._lock:
+            self._refresh()
+            return list(self._entries)
+
+    def stats(self):
+        """图片数、有效字节数、压缩后的字节数与当前文件字节数"""
+        with self._lock:
+            self._refresh()
+            return {
+                'images': len(self._entries),
+                'live_bytes': sum(entry.length for entry in self._entries.values()),
+                'compacted_bytes': _HEADER_SIZE + sum(
+                    _RECORD.size + len(name.encode('utf-8')) + entry.length
+                    for name, entry in self._entries.items()
+                ),
+                'file_bytes': os.path.getsize(self.path),
+            }
+
+
+class _PackWriteLock:
+    """pack 写锁：进程内用线程锁，进程间用 flock（pack 被压缩替换后重新加锁）"""
+
+    def __init__(self, pack):
+        self.pack = pack
+        self._file = None
+
+    def __enter__(self):
+        pack = self.pack
+        pack._lock.acquire()
+        try:
+            while True:
+                self._file = open(pack.path, 'ab+')
+                if fcntl is not None:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+                # 等锁期间 pack 可能已被其他进程压缩替换，需要锁住新文件
+                if os.fstat(self._file.fileno()).st_ino == os.stat(pack.path).st_ino:
+                    break
+                self._file.close()
+            if os.fstat(self._file.fileno()).st_size == 0:
+                self._file.write(_PACK_MAGIC + os.urandom(8))
+                self._file.flush()
+            elif hasattr(pack, '_entries'):
+                pack._refresh()
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.pack._lock.release()
+
+
+_packs = OrderedDict()
+_packs_lock = threading.Lock()
+
+
+def open_pack(path, create=True):
+    """
+    进程内共享的 pack 实例，最近使用的 MAX_OPEN_PACKS 个保持打开
+
+    Args:
+        path (str): pack 文件路径
+        create (bool): 文件不存在时是否创建；只读场景传 False，不存在时抛出 FileNotFoundError
+    """
+    with _packs_lock:
+        pack = _packs.get(path)
+        if pack is not None:
+            _packs.move_to_end(path)
+            return pack
+    pack = ImagePack(path, create=create)
+    with _packs_lock:
+        pack = _packs.setdefault(path, pack)
+        _packs.move_to_end(path)
+        while len(_packs) > MAX_OPEN_PACKS:
+            _packs.popitem(last=False)
+    return pack
+
+
+def read_image(path):
+    """
+    读取图片内容
+
+    Args:
+        path (str): 普通文件路径，或 "<pack 路径>#<图片名>" 引用
+
+    Returns:
+        bytes 或 memoryview: 图片内容（pack 中的图片直接引用 mmap）
+    """
+    pack_path, name = split_ref(path)
+    if pack_path:
+        return open_pack(pack_path, create=False).get(name)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def remove_pack(path):
+    """删除 pack 及其索引"""
+    with _packs_lock:
+        _packs.pop(path, None)
+    for file_path in (path, path[:-len(PACK_SUFFIX)] + INDEX_SUFFIX):
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+
+
+def compact_all(directory, min_waste=0.0):
+    """
+    压缩目录下的所有 pack
+
+    Args:
+        directory (str): 图片目录
+        min_waste (float): 失效数据占比不低于该值的 pack 才压缩
+
+    Returns:
+        dict: 检查的 pack 数、压缩的 pack 数与回收的字节数
+    """
+    result = {'packs': 0, 'compacted': 0, 'reclaimed_bytes': 0}
+    for entry in os.scandir(directory):
+        if not entry.is_file() or not is_pack(entry.name):
+            continue
+        result['packs'] += 1
+        try:
+            pack = open_pack(entry.path)
+            stats = pack.stats()
+            waste = 1 - stats['compacted_bytes'] / stats['file_bytes']
+            if waste > 0 and waste >= min_waste:
+                result['reclaimed_bytes'] += pack.compact()
+                result['compacted'] += 1
+        except (OSError, ValueError) as e:
+            logger.error(f"压缩图片 pack 失败 {entry.path}: {e}")
+    return result
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标采集
+提供线程安全的计数器与直方图，并按 Prometheus 文本格式导出，
+由 api_server 的 /metrics 接口对外暴露。
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+# 默认直方图分桶（秒），覆盖从毫秒级解析到分钟级OCR
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    body = ','.join(
+        '{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for k, v in pairs
+    )
+    return '{' + body + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """指标基类，按标签值分别保存数据"""
+
+    type_name = ''
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}，实际传入 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _header(self):
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+
+    def render(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """直方图，记录耗时等分布"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """统计代码块耗时（异常退出同样计入）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            items = sorted((k, dict(v, counts=list(v['counts']))) for k, v in self._values.items())
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['counts']):
+                cumulative += count
+                le = ('le', _format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """导出 Prometheus 文本格式"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+FETCH_SECONDS = REGISTRY.register(Histogram(
+    'wechat_fetch_seconds', '文章页面请求耗时（秒）'))
+PARSE_SECONDS = REGISTRY.register(Histogram(
+    'wechat_parse_seconds', '文章页面解析耗时（秒）'))
+IMAGE_DOWNLOAD_SECONDS = REGISTRY.register(Histogram(
+    'wechat_image_download_seconds', '单张图片下载耗时（秒）'))
+OCR_SECONDS = REGISTRY.register(Histogram(
+    'wechat_ocr_seconds', '单张图片OCR识别耗时（秒）'))
+OCR_QUEUE_WAIT_SECONDS = REGISTRY.register(Histogram(
+    'wechat_ocr_queue_wait_seconds', 'OCR任务在调度器中的排队耗时（秒）', ['priority']))
+FEISHU_SECONDS = REGISTRY.register(Histogram(
+    'wechat_feishu_request_seconds', '飞书开放平台接口请求耗时（秒）', ['operation']))
+BYTES_DOWNLOADED = REGISTRY.register(Counter(
+    'wechat_bytes_downloaded_total', '下载的字节数', ['kind']))
+IMAGES_SKIPPED = REGISTRY.register(Counter(
+    'wechat_images_skipped_total', '被跳过的图片数', ['reason']))
+CACHE_HITS = REGISTRY.register(Counter(
+    'wechat_cache_hits_total', '共享缓存命中次数', ['cache']))
+CACHE_MISSES = REGISTRY.register(Counter(
+    'wechat_cache_misses_total', '共享缓存未命中次数', ['cache']))
+FETCH_RETRIES = REGISTRY.register(Counter(
+    'wechat_fetch_retries_total', '网络请求重试次数', ['host']))
+BREAKER_REJECTIONS = REGISTRY.register(Counter(
+    'wechat_breaker_rejections_total', '因主机熔断被拒绝的请求数', ['host']))
+THROTTLE_EVENTS = REGISTRY.register(Counter(
+    'wechat_throttle_events_total', '限流或反爬验证次数', ['host', 'reason']))
+
+
+def render():
+    """导出默认注册表中的全部指标"""
+    return REGISTRY.render()
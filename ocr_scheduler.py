@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR 调度器
+进程内所有 OCR 任务共用一组工作线程（即 Tesseract 并发容量），按优先级调度：
+1. interactive - 交互请求（API），总是优先执行，并预留部分工作线程
+2. bulk        - 批量抓取，只使用非预留的工作线程
+
+同一优先级内按提交任务的作业（通常为一篇文章）轮转，
+避免图片很多的文章独占 OCR；队列长度有上限，队列满时提交方阻塞或收到 SchedulerBusy。
+
+API（uvicorn）、批量模式与 worker 是各自独立的进程，各有一个调度器。
+为了让交互请求在同一主机上优先于其他进程的批量任务，任务执行前还需取得主机级的 OCR 槽位
+（config.OCR_SLOT_DIR 下的槽位文件，以 flock 加锁，进程退出时自动释放）：
+批量任务不能使用前 OCR_INTERACTIVE_RESERVED 个槽位，且有交互任务在等待槽位时不再领取新槽位。
+"""
+
+import contextvars
+import os
+import random
+import threading
+import time
+import logging
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+try:
+    import fcntl
+except ImportError:  # Windows 下只能在进程内调度
+    fcntl = None
+
+import config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+PRIORITIES = (INTERACTIVE, BULK)
+
+
+class SchedulerBusy(Exception):
+    """OCR 队列已满，提交超时"""
+
+
+class HostSlots:
+    """同一主机上所有进程共用的 OCR 槽位"""
+
+    # 等待槽位时的轮询间隔（秒）：交互任务轮询更频繁，批量任务退避到更长的间隔
+    POLL_INTERVAL = {INTERACTIVE: (0.002, 0.02), BULK: (0.01, 0.2)}
+
+    def __init__(self, directory, slots, reserved_interactive):
+        """
+        Args:
+            directory (str): 槽位文件所在目录，同一主机上的进程需使用同一目录
+            slots (int): 槽位数，即全主机同时运行的 Tesseract 进程数
+            reserved_interactive (int): 仅供交互任务使用的槽位数
+        """
+        self.directory = directory
+        self.slots = max(1, slots)
+        # 至少保留一个槽位给批量任务
+        self.reserved = max(0, min(reserved_interactive, self.slots - 1))
+        os.makedirs(directory, exist_ok=True)
+        self._waiting_path = os.path.join(directory, 'interactive.waiting')
+
+    def _slot_path(self, index):
+        return os.path.join(self.directory, f"slot-{index}.lock")
+
+    def _try_lock(self, path, flags):
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, flags | fcntl.LOCK_NB)
+            return fd
+        except BlockingIOError:
+            os.close(fd)
+            return None
+
+    def interactive_waiting(self):
+        """是否有交互任务（任意进程）正在等待槽位"""
+        fd = self._try_lock(self._waiting_path, fcntl.LOCK_EX)
+        if fd is None:
+            return True
+        os.close(fd)
+        return False
+
+    def acquire(self, priority):
+        """
+        阻塞直到取得一个槽位
+
+        Returns:
+            int: 槽位文件描述符，交给 release() 释放
+        """
+        first = 0 if priority == INTERACTIVE else self.reserved
+        candidates = list(range(first, self.slots))
+        waiting_fd = None
+        if priority == INTERACTIVE:
+            # 等待期间持有共享锁，批量任务据此让出空闲槽位
+            waiting_fd = os.open(self._waiting_path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(waiting_fd, fcntl.LOCK_SH)
+        interval, max_interval = self.POLL_INTERVAL[priority]
+        try:
+            while True:
+                if priority == INTERACTIVE or not self.interactive_waiting():
+                    # 从随机位置开始尝试，减少多个进程争抢同一个槽位
+                    start = random.randrange(len(candidates))
+                    for index in candidates[start:] + candidates[:start]:
+                        fd = self._try_lock(self._slot_path(index), fcntl.LOCK_EX)
+                        if fd is not None:
+                            return fd
+                time.sleep(interval)
+                interval = min(max_interval, interval * 2)
+        finally:
+            if waiting_fd is not None:
+                os.close(waiting_fd)
+
+    def release(self, fd):
+        os.close(fd)
+
+    def busy(self):
+        """当前被占用的槽位数"""
+        count = 0
+        for index in range(self.slots):
+            fd = self._try_lock(self._slot_path(index), fcntl.LOCK_EX)
+            if fd is None:
+                count += 1
+            else:
+                os.close(fd)
+        return count
+
+
+class OCRScheduler:
+    """带优先级与公平轮转的 OCR 任务调度器"""
+
+    def __init__(self, workers=None, reserved_interactive=None, max_queue=None, host_slots=None):
+        """
+        Args:
+            workers (int): 工作线程数（本进程同时运行的 Tesseract 进程数）
+            reserved_interactive (int): 仅供交互任务使用的工作线程数
+            max_queue (dict): 各优先级的最大排队任务数
+            host_slots (HostSlots): 主机级 OCR 槽位，为空表示只在进程内调度
+        """
+        self.workers = max(1, workers or config.OCR_WORKERS)
+        reserved = config.OCR_INTERACTIVE_RESERVED if reserved_interactive is None else reserved_interactive
+        # 至少保留一个线程给批量任务，否则批量任务永远无法执行
+        self.bulk_limit = max(1, self.workers - reserved)
+        self.max_queue = dict(max_queue or config.OCR_MAX_QUEUE)
+        self.host_slots = host_slots
+        self._cond = threading.Condition()
+        self._queues = {priority: OrderedDict() for priority in PRIORITIES}
+        self._depth = {priority: 0 for priority in PRIORITIES}
+        self._running = {priority: 0 for priority in PRIORITIES}
+        self._threads = []
+
+    def start(self):
+        """启动工作线程（首次提交任务时也会自动启动）"""
+        with self._cond:
+            self._ensure_started()
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"ocr-worker-{i + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fn, *args, priority=BULK, job_id=None, timeout=None, **kwargs):
+        """
+        提交 OCR 任务
+
+        Args:
+            fn (callable): 任务函数
+            priority (str): INTERACTIVE 或 BULK
+            job_id (str): 作业标识，同一优先级内按作业轮转
+            timeout (float): 队列已满时最多等待的秒数，None 表示一直等待
+
+        Returns:
+            Future: 任务结果
+
+        Raises:
+            SchedulerBusy: 等待超时后队列仍然已满
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"未知的OCR优先级: {priority}")
+        future = Future()
+        # 在提交方的上下文中执行任务，使请求级的上下文变量（如性能分析）在工作线程中可见
+        context = contextvars.copy_context()
+        task = (future, context, fn, args, kwargs, time.perf_counter())
+        with self._cond:
+            self._ensure_started()
+            end = None if timeout is None else time.monotonic() + timeout
+            while self._depth[priority] >= self.max_queue[priority]:
+                remaining = None if end is None else end - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise SchedulerBusy(f"OCR队列已满（{priority}: {self._depth[priority]}）")
+                self._cond.wait(remaining)
+            self._queues[priority].setdefault(job_id, deque()).append(task)
+            self._depth[priority] += 1
+            self._cond.notify_all()
+        return future
+
+    def _pop(self, priority):
+        queue = self._queues[priority]
+        job_id, tasks = next(iter(queue.items()))
+        task = tasks.popleft()
+        if tasks:
+            # 轮转到队尾，下一次取其他作业的任务
+            queue.move_to_end(job_id)
+        else:
+            del queue[job_id]
+        self._depth[priority] -= 1
+        self._running[priority] += 1
+        return priority, task
+
+    def _next_task(self):
+        if self._queues[INTERACTIVE]:
+            return self._pop(INTERACTIVE)
+        if self._queues[BULK] and self._running[BULK] < self.bulk_limit:
+            return self._pop(BULK)
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                item = self._next_task()
+                while item is None:
+                    self._cond.wait()
+                    item = self._next_task()
+                # 队列有空位，唤醒等待提交的生产者
+                self._cond.notify_all()
+            priority, (future, context, fn, args, kwargs, submitted) = item
+            slot = None
+            try:
+                if self.host_slots is not None and not future.cancelled():
+                    slot = self.host_slots.acquire(priority)
+                if future.set_running_or_notify_cancel():
+                    metrics.OCR_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - submitted, priority=priority)
+                    try:
+                        future.set_result(context.run(fn, *args, **kwargs))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                if slot is not None:
+                    self.host_slots.release(slot)
+                with self._cond:
+                    self._running[priority] -= 1
+                    self._cond.notify_all()
+
+    def stats(self):
+        """各优先级的排队与运行中任务数（运行中包括等待主机槽位的任务）"""
+        with self._cond:
+            stats = {
+                priority: {'queued': self._depth[priority], 'running': self._running[priority]}
+                for priority in PRIORITIES
+            }
+        if self.host_slots is not None:
+            stats['host_slots'] = {'total': self.host_slots.slots, 'busy': self.host_slots.busy()}
+        return stats
+
+
+def create_host_slots():
+    """按配置创建主机级 OCR 槽位，未启用或平台不支持时返回 None"""
+    slots = config.OCR_WORKERS if config.OCR_HOST_SLOTS is None else config.OCR_HOST_SLOTS
+    if not slots:
+        return None
+    if fcntl is None:
+        logger.warning("当前平台不支持 flock，OCR 优先级只在进程内生效")
+        return None
+    return HostSlots(config.OCR_SLOT_DIR, slots, config.OCR_INTERACTIVE_RESERVED)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """进程内共享的 OCR 调度器"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = OCRScheduler(host_slots=create_host_slots())
+    return _scheduler
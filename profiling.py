@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+请求级性能分析
+对单个 API 请求开启性能分析（config.PROFILING_ENABLED 为 True 时生效）：
+
+    curl -H 'X-Profile: cprofile' 'http://localhost:8000/article/info?url=...'
+    curl 'http://localhost:8000/article/info?url=...&profile=sample'
+
+两种模式：
+1. cprofile - 用 cProfile 记录函数调用，结果为 .prof 文件（可用 snakeviz、flameprof 等查看）
+2. sample   - 定时采样调用栈，结果为折叠栈 .folded 文件（可直接用 flamegraph.pl / speedscope 生成火焰图）
+
+抓取、解析与OCR在线程池中执行。请求的分析对象保存在上下文变量中，随 asyncio.to_thread
+与 OCR 调度器传递到工作线程，工作线程通过 call() 执行时即被纳入该请求的分析结果。
+事件循环线程同时服务多个请求，不在分析范围内。
+结果保存在 config.PROFILE_DIR，文件名通过响应头 X-Profile-Id 返回，可从 /profiles/<文件名> 下载。
+"""
+
+import asyncio
+import contextvars
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+import logging
+from collections import Counter
+from urllib.parse import parse_qs
+
+import config
+
+logger = logging.getLogger(__name__)
+
+CPROFILE = 'cprofile'
+SAMPLE = 'sample'
+MODES = (CPROFILE, SAMPLE)
+
+HEADER = 'x-profile'
+QUERY_PARAM = 'profile'
+
+_current = contextvars.ContextVar('request_profile', default=None)
+_local = threading.local()
+
+
+class RequestProfile:
+    """单个请求的性能分析结果"""
+
+    def __init__(self, mode, label):
+        """
+        Args:
+            mode (str): CPROFILE 或 SAMPLE
+            label (str): 请求描述（如 "GET /article/info"）
+        """
+        self.mode = mode
+        self.label = label
+        suffix = '.prof' if mode == CPROFILE else '.folded'
+        self.filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}{suffix}"
+        self.started = time.perf_counter()
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._stats = None
+        self._threads = Counter()
+        self._samples = Counter()
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        if self.mode == SAMPLE:
+            self._sampler = threading.Thread(target=self._sample_loop, name='profile-sampler', daemon=True)
+            self._sampler.start()
+
+    def _sample_loop(self):
+        while not self._stop.wait(config.PROFILE_SAMPLE_INTERVAL):
+            with self._lock:
+                idents = list(self._threads)
+            frames = sys._current_frames()
+            for ident in idents:
+                frame = frames.get(ident)
+                if frame is not None:
+                    self._samples[_fold(frame)] += 1
+
+    def _run_sampled(self, fn, args, kwargs):
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._threads[ident] -= 1
+                if not self._threads[ident]:
+                    del self._threads[ident]
+
+    def _run_profiled(self, fn, args, kwargs):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ 同一时刻只允许一个 cProfile 处于开启状态
+            self.skipped += 1
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.disable()
+            with self._lock:
+                try:
+                    if self._stats is None:
+                        self._stats = pstats.Stats(profiler)
+                    else:
+                        self._stats.add(profiler)
+                except TypeError:
+                    # 没有记录到任何调用
+                    pass
+
+    def finish(self, directory):
+        """
+        结束分析并写入文件
+
+        Returns:
+            str: 结果文件路径
+        """
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.filename)
+        with self._lock:
+            if self.mode == CPROFILE:
+                if self._stats is not None:
+                    self._stats.dump_stats(path)
+                else:
+                    cProfile.Profile().dump_stats(path)
+            else:
+                with open(path, 'w', encoding='utf-8') as f:
+                    for stack, count in self._samples.most_common():
+                        f.write(f"{stack} {count}\n")
+        _prune(directory)
+        return path
+
+
+def _fold(frame):
+    """把调用栈转换为折叠栈格式（外层在前，以分号分隔）"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ','))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def _prune(directory):
+    """只保留最近的 config.PROFILE_MAX_FILES 个结果文件"""
+    files = [entry for entry in os.scandir(directory) if entry.is_file() and entry.name.endswith(('.prof', '.folded'))]
+    if len(files) <= config.PROFILE_MAX_FILES:
+        return
+    files.sort(key=lambda entry: entry.stat().st_mtime)
+    for entry in files[:len(files) - config.PROFILE_MAX_FILES]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def call(fn, *args, **kwargs):
+    """
+    执行 fn；当前上下文中有进行中的请求分析时，把本次执行纳入分析结果
+
+    在工作线程中执行的阻塞任务应通过该函数调用，例如
+    asyncio.to_thread(profiling.call, fn, ...)。
+    """
+    profile = _current.get()
+    if profile is None or getattr(_local, 'active', False):
+        return fn(*args, **kwargs)
+    _local.active = True
+    try:
+        if profile.mode == SAMPLE:
+            return profile._run_sampled(fn, args, kwargs)
+        return profile._run_profiled(fn, args, kwargs)
+    finally:
+        _local.active = False
+
+
+def requested_mode(scope):
+    """从请求头或查询参数中读取分析模式，未请求时返回 None"""
+    value = None
+    for name, header_value in scope.get('headers', []):
+        if name.decode('latin-1').lower() == HEADER:
+            value = header_value.decode('latin-1')
+            break
+    if value is None:
+        values = parse_qs(scope.get('query_string', b'').decode('latin-1')).get(QUERY_PARAM)
+        value = values[0] if values else None
+    if not value:
+        return None
+    value = value.strip().lower()
+    if value in ('1', 'true', 'yes'):
+        return config.PROFILE_DEFAULT_MODE
+    return value if value in MODES else None
+
+
+class ProfilingMiddleware:
+    """ASGI 中间件：对带分析标记的请求进行性能分析，覆盖到响应体发送完毕（包括流式响应）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        mode = requested_mode(scope) if scope['type'] == 'http' and config.PROFILING_ENABLED else None
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(mode, f"{scope['method']} {scope['path']}")
+
+        async def send_with_header(message):
+            if message['type'] == 'http.response.start':
+                headers = list(message.get('headers', []))
+                headers.append((b'x-profile-id', profile.filename.encode('latin-1')))
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        token = _current.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            _current.reset(token)
+            path = await asyncio.to_thread(profile.finish, config.PROFILE_DIR)
+            elapsed = time.perf_counter() - profile.started
+            logger.info(f"性能分析已保存: {path}（{profile.label}，耗时 {elapsed:.3f} 秒）")
+            if profile.skipped:
+                logger.warning(f"性能分析有 {profile.skipped} 段并发执行未能记录（同一时刻只能开启一个 cProfile）")
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+结果输出（Sink）
+process_article 的结果逐篇写入 Sink，不在内存中累积整批数据：
+1. ConsoleSink - 控制台预览输出（原 print_results 行为）
+2. JsonlSink   - 追加写入的 JSONL，可选 gzip / zstd 压缩
+3. ParquetSink - 列式 Parquet 输出，按行组批量落盘
+
+write() 与 close() 返回已经"持久落盘"的文章链接列表，
+批量模式据此更新断点，保证断点中的文章在结果文件中一定存在。
+"""
+
+import gzip
+import json
+import os
+import tempfile
+import zlib
+import logging
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class ResultSink:
+    """结果输出基类"""
+
+    def write(self, article_info):
+        """
+        写入一篇文章的结果
+
+        Args:
+            article_info (dict): process_article 返回的文章信息
+
+        Returns:
+            list: 本次调用后新持久化的文章链接
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """关闭输出，返回关闭时才持久化的文章链接"""
+        return []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConsoleSink(ResultSink):
+    """控制台输出，复用抓取器的 print_results"""
+
+    def __init__(self, scraper):
+        self.scraper = scraper
+
+    def write(self, article_info):
+        self.scraper.print_results(article_info)
+        return [article_info['url']]
+
+
+class JsonlSink(ResultSink):
+    """追加写入的 JSONL 输出，每篇文章一行"""
+
+    COMPRESSIONS = (None, 'gzip', 'zstd')
+
+    # 打开时检查文件尾部的读取块大小
+    _CHUNK = 1024 * 1024
+
+    def __init__(self, path, compression=None):
+        """
+        Args:
+            path (str): 输出文件路径
+            compression (str): 压缩方式，None / 'gzip' / 'zstd'
+
+        压缩时每篇文章写成一个完整的 gzip member / zstd frame，标准解压工具会把它们拼接读出。
+        进程在写入中途被杀死时，文件末尾最多留下一条不完整的记录；
+        续跑打开文件时先截掉这部分（旧版本写入的未结束压缩流会解压出完整的行后重新写入），
+        再追加新的结果，整个文件始终可以解压。
+        """
+        if compression not in self.COMPRESSIONS:
+            raise ValueError(f"不支持的压缩方式: {compression}")
+        self.path = path
+        self.compression = compression
+        if compression == 'gzip':
+            self._compress = gzip.compress
+            self._decompressor = lambda: zlib.decompressobj(wbits=31)
+            self._errors = (zlib.error,)
+        elif compression == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                raise RuntimeError("使用 zstd 压缩需要安装 zstandard: pip install zstandard")
+            compressor = zstandard.ZstdCompressor()
+            self._compress = compressor.compress
+            self._decompressor = lambda: zstandard.ZstdDecompressor().decompressobj()
+            self._errors = (zstandard.ZstdError,)
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            if compression:
+                self._repair_compressed()
+            else:
+                self._repair_plain()
+        self._fh = open(path, 'ab')
+
+    def _repair_plain(self):
+        """截掉末尾没有换行的半行"""
+        with open(self.path, 'r+b') as f:
+            size = f.seek(0, os.SEEK_END)
+            end = size
+            while end > 0:
+                start = max(0, end - self._CHUNK)
+                f.seek(start)
+                newline = f.read(end - start).rfind(b'\n')
+                if newline >= 0:
+                    end = start + newline + 1
+                    break
+                end = start
+            if end < size:
+                logger.warning(f"输出文件末尾有不完整的记录（{size - end} 字节），已截断: {self.path}")
+                f.truncate(end)
+
+    def _repair_compressed(self):
+        """截掉末尾不完整的 gzip member / zstd frame，其中已完整解压出的行重新写入"""
+        member_start = 0
+        pos = 0
+        decompressor = self._decompressor()
+        with open(self.path, 'rb') as f, tempfile.TemporaryFile() as recovered:
+            pending = b''
+            while True:
+                if not pending:
+                    pending = f.read(self._CHUNK)
+                    if not pending:
+                        break
+                    pos += len(pending)
+                try:
+                    recovered.write(decompressor.decompress(pending))
+                except self._errors:
+                    break
+                if decompressor.eof:
+                    pending = decompressor.unused_data
+                    member_start = pos - len(pending)
+                    decompressor = self._decompressor()
+                    recovered.seek(0)
+                    recovered.truncate()
+                else:
+                    pending = b''
+            size = os.path.getsize(self.path)
+            if member_start == size:
+                return
+
+            # 取出不完整部分中已经完整的行
+            recovered.seek(0)
+            text = recovered.read()
+            text = text[:text.rfind(b'\n') + 1]
+            with open(self.path, 'r+b') as out:
+                out.truncate(member_start)
+                out.seek(member_start)
+                if text:
+                    out.write(self._compress(text))
+        lines = text.count(b'\n')
+        logger.warning(
+            f"输出文件末尾有不完整的压缩数据（{size - member_start} 字节），"
+            f"已截断并保留其中 {lines} 条完整记录: {self.path}"
+        )
+
+    def write(self, article_info):
+        line = (json.dumps(article_info, ensure_ascii=False) + '\n').encode('utf-8')
+        if self.compression:
+            line = self._compress(line)
+        self._fh.write(line)
+        self._fh.flush()
+        return [article_info['url']]
+
+    def close(self):
+        self._fh.close()
+        return []
+
+
+class ParquetSink(ResultSink):
+    """
+    Parquet 列式输出
+
+    path 为输出目录，每累积 row_group_size 篇文章写出一个完整的
+    part 文件（先写临时文件再原子重命名），整个目录可作为数据集读取。
+    已有的 part 文件会保留，续跑时继续编号。
+    """
+
+    def __init__(self, path, row_group_size=None):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("输出 Parquet 需要安装 pyarrow: pip install pyarrow")
+        self._pa = pa
+        self._pq = pq
+        self.path = path
+        self.row_group_size = max(1, row_group_size or config.PARQUET_ROW_GROUP_SIZE)
+        self._buffer = []
+        os.makedirs(path, exist_ok=True)
+        existing = [f for f in os.listdir(path) if f.startswith('part-') and f.endswith('.parquet')]
+        self._part = len(existing)
+
+        image = pa.struct([('src', pa.string()), ('alt', pa.string()), ('title', pa.string())])
+        ocr = pa.struct([
+            ('image_url', pa.string()),
+            ('local_path', pa.string()),
+            ('ocr_text', pa.string()),
+            ('alt', pa.string()),
+            ('title', pa.string()),
+        ])
+        self.schema = pa.schema([
+            ('url', pa.string()),
+            ('title', pa.string()),
+            ('content', pa.string()),
+            ('account_name', pa.string()),
+            ('publish_date', pa.string()),
+            ('images', pa.list_(image)),
+            ('ocr_results', pa.list_(ocr)),
+            ('partial', pa.bool_()),
+            ('pending_images', pa.list_(pa.string())),
+        ])
+
+    def _flush(self):
+        if not self._buffer:
+            return []
+        table = self._pa.Table.from_pylist(self._buffer, schema=self.schema)
+        final_path = os.path.join(self.path, f"part-{self._part:05d}.parquet")
+        tmp_path = final_path + '.tmp'
+        self._pq.write_table(table, tmp_path, row_group_size=self.row_group_size)
+        os.replace(tmp_path, final_path)
+        self._part += 1
+        urls = [record['url'] for record in self._buffer]
+        self._buffer = []
+        logger.info(f"写入 Parquet 分片: {final_path} ({len(urls)} 篇)")
+        return urls
+
+    def write(self, article_info):
+        self._buffer.append(article_info)
+        if len(self._buffer) >= self.row_group_size:
+            return self._flush()
+        return []
+
+    def close(self):
+        return self._flush()
+
+
+def create_sink(path, fmt=None, compression=None):
+    """
+    根据格式创建结果输出
+
+    Args:
+        path (str): 输出路径
+        fmt (str): 'jsonl' 或 'parquet'，为空时按扩展名推断
+        compression (str): JSONL 压缩方式，为空时按扩展名推断
+
+    Returns:
+        ResultSink: 结果输出实例
+    """
+    if not fmt:
+        fmt = 'parquet' if path.endswith('.parquet') else 'jsonl'
+    if fmt == 'parquet':
+        return ParquetSink(path)
+    if fmt != 'jsonl':
+        raise ValueError(f"不支持的输出格式: {fmt}")
+    if compression is None:
+        if path.endswith('.gz'):
+            compression = 'gzip'
+        elif path.endswith('.zst'):
+            compression = 'zstd'
+    elif compression == 'none':
+        compression = None
+    return JsonlSink(path, compression=compression)
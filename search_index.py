@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全文检索索引
+基于 SQLite FTS5，索引已处理文章的标题、公众号名称、正文与OCR文本。
+
+FTS5 自带的分词器不切分中文，因此写入与查询前先在 Python 中分词：
+连续的中文字符切成相邻两字一组的 bigram，并在末尾追加最后一个字
+（“公众号” -> “公众 众号 号”），英文与数字按单词切分并转为小写。
+查询词按同样方式切分后作为短语匹配，相当于子串匹配，不依赖词典；
+单个汉字按前缀匹配，每个字都是某个词项的开头，因此在任何位置都能命中。
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import logging
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 中日韩统一表意文字（含扩展A区与兼容区）
+_CJK = r'\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+_WORD = r'0-9A-Za-z\u00c0-\u024f'
+_TOKEN_RE = re.compile(f'([{_CJK}]+)|([{_WORD}]+)')
+
+# bm25 各列权重：标题、公众号名称、正文、OCR文本
+_COLUMN_WEIGHTS = (10.0, 5.0, 1.0, 1.0)
+
+SNIPPET_LENGTH = 80
+
+# 分词方式的版本，变化时已有索引按 documents 表中的原文重建
+TOKENIZER_VERSION = 2
+
+
+def _terms(text, tail=False):
+    """
+    把文本切分为词项组，每个中文片段或英文单词为一组
+
+    Args:
+        text (str): 原文
+        tail (bool): 中文片段末尾追加最后一个字（写入索引时使用，使单字查询能命中片段末尾的字）
+    """
+    groups = []
+    for match in _TOKEN_RE.finditer(text or ''):
+        cjk, word = match.groups()
+        if cjk:
+            if len(cjk) == 1:
+                groups.append([cjk])
+            else:
+                group = [cjk[i:i + 2] for i in range(len(cjk) - 1)]
+                if tail:
+                    group.append(cjk[-1])
+                groups.append(group)
+        else:
+            groups.append([word.lower()])
+    return groups
+
+
+def tokenize(text):
+    """
+    分词，返回以空格分隔的词项，供 FTS5 的 unicode61 分词器直接按空格切分
+
+    Args:
+        text (str): 原文
+
+    Returns:
+        str: 分词结果
+    """
+    return ' '.join(token for group in _terms(text, tail=True) for token in group)
+
+
+def build_query(query):
+    """
+    把用户输入转换为 FTS5 查询表达式
+
+    每个中文片段或英文单词作为一个短语，多个短语之间为“与”关系；
+    单个中文字符按前缀匹配，命中以它开头的 bigram 或片段末尾的该字。
+
+    Returns:
+        str: 查询表达式，没有可检索的词时返回空字符串
+    """
+    phrases = []
+    for group in _terms(query):
+        phrase = '"' + ' '.join(group) + '"'
+        if len(group) == 1 and len(group[0]) == 1 and re.match(f'[{_CJK}]', group[0]):
+            phrase += '*'
+        phrases.append(phrase)
+    return ' AND '.join(phrases)
+
+
+def _snippet(text, query, length=SNIPPET_LENGTH):
+    """截取原文中第一个命中查询词附近的片段，没有命中时返回 None"""
+    text = re.sub(r'\s+', ' ', text or '')
+    lowered = text.lower()
+    positions = [lowered.find(match.group()) for match in _TOKEN_RE.finditer(query.lower())]
+    positions = [pos for pos in positions if pos >= 0]
+    if not positions:
+        return None
+    start = max(0, min(positions) - length // 4)
+    snippet = text[start:start + length]
+    return ('…' if start > 0 else '') + snippet + ('…' if start + length < len(text) else '')
+
+
+class SearchIndex:
+    """SQLite FTS5 全文索引"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): 索引数据库文件路径
+        """
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL UNIQUE,
+                title TEXT,
+                account_name TEXT,
+                publish_date TEXT,
+                content TEXT,
+                ocr_text TEXT,
+                digest TEXT,
+                indexed_at REAL
+            )
+        ''')
+        try:
+            conn.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+                    title, account_name, body, ocr, tokenize = 'unicode61'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            raise RuntimeError(f"当前 SQLite 不支持 FTS5，无法创建全文索引: {e}")
+        if conn.execute('PRAGMA user_version').fetchone()[0] < TOKENIZER_VERSION:
+            self._rebuild()
+
+    def _rebuild(self):
+        """按当前分词方式重建全文索引（旧版本创建的索引）"""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # 其他进程可能已经完成重建
+            if conn.execute('PRAGMA user_version').fetchone()[0] < TOKENIZER_VERSION:
+                conn.execute('DELETE FROM documents_fts')
+                rows = conn.execute('SELECT id, title, account_name, content, ocr_text FROM documents')
+                conn.executemany(
+                    'INSERT INTO documents_fts (rowid, title, account_name, body, ocr) VALUES (?, ?, ?, ?, ?)',
+                    ((row[0], *(tokenize(field) for field in row[1:])) for row in rows)
+                )
+                conn.execute(f'PRAGMA user_version = {TOKENIZER_VERSION}')
+                count = conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+                if count:
+                    logger.info(f"分词方式已更新，重建全文索引 {count} 篇: {self.path}")
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def add(self, article_info, ocr_texts=None, partial=False):
+        """
+        写入或更新一篇文章
+
+        Args:
+            article_info (dict): 文章信息（url、title、account_name、publish_date、content）
+            ocr_texts (list): 各图片的OCR文本；为 None 时保留已索引的OCR文本（如本次未做OCR）
+            partial (bool): OCR文本不完整，已有OCR文本时不覆盖
+
+        Returns:
+            bool: 是否写入（内容未变化时跳过）
+        """
+        url = article_info['url']
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT id, ocr_text, digest FROM documents WHERE url = ?', (url,)).fetchone()
+            if ocr_texts is None or (partial and row and row[1]):
+                ocr_text = row[1] if row else ''
+            else:
+                ocr_text = '\n'.join(text for text in ocr_texts if text)
+            fields = (
+                article_info.get('title') or '',
+                article_info.get('account_name') or '',
+                article_info.get('content') or '',
+                ocr_text,
+            )
+            digest = hashlib.sha1('\x00'.join(fields).encode('utf-8')).hexdigest()
+            if row and row[2] == digest:
+                conn.execute('COMMIT')
+                return False
+
+            if row:
+                doc_id = row[0]
+                conn.execute(
+                    'UPDATE documents SET title = ?, account_name = ?, publish_date = ?, content = ?, '
+                    'ocr_text = ?, digest = ?, indexed_at = ? WHERE id = ?',
+                    (fields[0], fields[1], article_info.get('publish_date') or '', fields[2], fields[3],
+                     digest, time.time(), doc_id)
+                )
+                conn.execute('DELETE FROM documents_fts WHERE rowid = ?', (doc_id,))
+            else:
+                doc_id = conn.execute(
+                    'INSERT INTO documents (url, title, account_name, publish_date, content, ocr_text, '
+                    'digest, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (url, fields[0], fields[1], article_info.get('publish_date') or '', fields[2], fields[3],
+                     digest, time.time())
+                ).lastrowid
+            conn.execute(
+                'INSERT INTO documents_fts (rowid, title, account_name, body, ocr) VALUES (?, ?, ?, ?, ?)',
+                (doc_id, *(tokenize(field) for field in fields))
+            )
+            conn.execute('COMMIT')
+            return True
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def remove(self, url):
+        """从索引中删除一篇文章"""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT id FROM documents WHERE url = ?', (url,)).fetchone()
+            if row:
+                conn.execute('DELETE FROM documents_fts WHERE rowid = ?', (row[0],))
+                conn.execute('DELETE FROM documents WHERE id = ?', (row[0],))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def search(self, query, limit=20, offset=0, account_name=None):
+        """
+        检索文章，按相关度排序
+
+        Args:
+            query (str): 查询词，多个词以空格分隔，需全部命中
+            limit (int): 返回条数
+            offset (int): 跳过的条数
+            account_name (str): 只检索指定公众号的文章
+
+        Returns:
+            list: 命中的文章，每项包含 url、title、account_name、publish_date、score、snippet
+        """
+        expression = build_query(query)
+        if not expression:
+            return []
+        sql = (
+            'SELECT d.url, d.title, d.account_name, d.publish_date, d.content, d.ocr_text, '
+            f'bm25(documents_fts, {", ".join(map(str, _COLUMN_WEIGHTS))}) AS score '
+            'FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid '
+            'WHERE documents_fts MATCH ?'
+        )
+        params = [expression]
+        if account_name:
+            sql += ' AND d.account_name = ?'
+            params.append(account_name)
+        sql += ' ORDER BY score LIMIT ? OFFSET ?'
+        params += [limit, offset]
+
+        hits = []
+        for url, title, account, publish_date, content, ocr_text, score in self._conn().execute(sql, params):
+            hits.append({
+                'url': url,
+                'title': title,
+                'account_name': account,
+                'publish_date': publish_date,
+                # bm25 越小越相关，取相反数使分数越大越相关
+                'score': round(-score, 6),
+                'snippet': _snippet(content, query) or _snippet(ocr_text, query) or (content or '')[:SNIPPET_LENGTH],
+            })
+        return hits
+
+    def count(self):
+        """已索引的文章数"""
+        return self._conn().execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """进程内共享的检索索引，未启用时返回 None"""
+    global _index
+    if not config.SEARCH_INDEX_ENABLED:
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SearchIndex(config.SEARCH_INDEX_PATH)
+    return _index
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+跨进程共享缓存
+基于 SQLite（WAL 模式）的键值缓存，同一主机上的多个进程（如 uvicorn --workers N）
+共用同一个缓存文件，缓存文章解析结果、图片内容与 OCR 结果。
+
+get_or_compute 提供跨进程的原子语义：同一个键同一时间只有一个进程在计算，
+其他进程等待其结果，而不是重复抓取或重复 OCR。
+
+缓存总大小受 config.CACHE_MAX_BYTES 限制，超出时按最近访问时间淘汰。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+
+import config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# 值的存储类型
+_BYTES = 'bytes'
+_JSON = 'json'
+
+
+class SharedCache:
+    """SQLite 共享缓存"""
+
+    # 两次清理过期条目之间的最小间隔（秒）
+    PURGE_INTERVAL = 600
+    # 命中时最多每隔多少秒更新一次访问时间，避免每次读取都写库
+    TOUCH_INTERVAL = 300
+
+    def __init__(self, path, lock_timeout=None, poll_interval=0.05, max_bytes=None):
+        """
+        Args:
+            path (str): 缓存数据库文件路径
+            lock_timeout (float): 计算锁的最长持有时间（秒），持有者崩溃后锁在此时长后失效
+            poll_interval (float): 等待其他进程计算结果时的轮询间隔（秒）
+            max_bytes (int): 缓存值的总大小上限（字节），默认 config.CACHE_MAX_BYTES，None 表示不限制
+        """
+        self.path = path
+        self.lock_timeout = lock_timeout or config.CACHE_LOCK_TIMEOUT
+        self.poll_interval = poll_interval
+        self.max_bytes = config.CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self._local = threading.local()
+        self._last_purge = 0.0
+        self._written = 0
+        self._written_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                value BLOB,
+                expires_at REAL,
+                size INTEGER,
+                accessed_at REAL,
+                PRIMARY KEY (namespace, key)
+            )
+        ''')
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(entries)')}
+        if 'size' not in columns:
+            # 旧版本创建的缓存文件
+            conn.execute('ALTER TABLE entries ADD COLUMN size INTEGER')
+            conn.execute('ALTER TABLE entries ADD COLUMN accessed_at REAL')
+            conn.execute('UPDATE entries SET size = length(value), accessed_at = ?', (time.time(),))
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at)')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS locks (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        ''')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return _BYTES, bytes(value)
+        return _JSON, json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+    @staticmethod
+    def _decode(kind, blob):
+        if kind == _BYTES:
+            return bytes(blob)
+        return json.loads(blob)
+
+    def get(self, namespace, key):
+        """
+        读取缓存
+
+        Returns:
+            tuple: (是否命中, 值)
+        """
+        conn = self._conn()
+        row = conn.execute(
+            'SELECT kind, value, expires_at, accessed_at FROM entries WHERE namespace = ? AND key = ?',
+            (namespace, key)
+        ).fetchone()
+        now = time.time()
+        if row is None or (row[2] is not None and row[2] < now):
+            return False, None
+        if row[3] is None or now - row[3] > self.TOUCH_INTERVAL:
+            conn.execute(
+                'UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?', (now, namespace, key)
+            )
+        return True, self._decode(row[0], row[1])
+
+    def set(self, namespace, key, value, ttl=None):
+        """写入缓存，ttl 为空表示永不过期"""
+        kind, blob = self._encode(value)
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        self._conn().execute(
+            'INSERT OR REPLACE INTO entries (namespace, key, kind, value, expires_at, size, accessed_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (namespace, key, kind, blob, expires_at, len(blob), now)
+        )
+        self._maybe_purge()
+        self._maybe_evict(len(blob))
+
+    def delete(self, namespace, key):
+        self._conn().execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (namespace, key))
+
+    def _try_lock(self, namespace, key, owner):
+        """尝试获取计算锁；已过期的锁（持有者可能已崩溃）可被接管"""
+        now = time.time()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT expires_at FROM locks WHERE namespace = ? AND key = ?', (namespace, key)
+            ).fetchone()
+            if row is not None and row[0] >= now:
+                conn.execute('COMMIT')
+                return False
+            conn.execute(
+                'INSERT OR REPLACE INTO locks (namespace, key, owner, expires_at) VALUES (?, ?, ?, ?)',
+                (namespace, key, owner, now + self.lock_timeout)
+            )
+            conn.execute('COMMIT')
+            return True
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _unlock(self, namespace, key, owner):
+        self._conn().execute(
+            'DELETE FROM locks WHERE namespace = ? AND key = ? AND owner = ?',
+            (namespace, key, owner)
+        )
+
+    def get_or_compute(self, namespace, key, compute, ttl=None, wait_timeout=None):
+        """
+        读取缓存，未命中时计算并写入
+
+        多个进程同时请求同一个键时只有一个进程执行 compute，其余进程等待结果。
+        compute 抛出异常或返回 None 时不写入缓存。
+
+        Args:
+            namespace (str): 命名空间（如 article / image / ocr）
+            key (str): 缓存键
+            compute (callable): 计算函数
+            ttl (float): 过期时长（秒），为空表示永不过期
+            wait_timeout (float): 最多等待其他进程计算的秒数，超时后自行计算；为空时以锁超时为准
+
+        Returns:
+            compute 的返回值或缓存中的值
+        """
+        hit, value = self.get(namespace, key)
+        if hit:
+            metrics.CACHE_HITS.inc(cache=namespace)
+            return value
+
+        # 锁的持有者按调用区分：同一进程的其他线程也可能在计算同一个键
+        owner = f"{os.getpid()}-{uuid.uuid4().hex}"
+        locked = False
+        give_up_at = time.monotonic() + (self.lock_timeout if wait_timeout is None else wait_timeout)
+        while not self._try_lock(namespace, key, owner):
+            if time.monotonic() >= give_up_at:
+                logger.debug(f"等待缓存计算超时，自行计算: {namespace}/{key}")
+                break
+            time.sleep(self.poll_interval)
+            hit, value = self.get(namespace, key)
+            if hit:
+                metrics.CACHE_HITS.inc(cache=namespace)
+                return value
+        else:
+            locked = True
+            # 获得锁后再检查一次：其他进程可能刚好在释放锁前写入了结果
+            hit, value = self.get(namespace, key)
+            if hit:
+                self._unlock(namespace, key, owner)
+                metrics.CACHE_HITS.inc(cache=namespace)
+                return value
+
+        metrics.CACHE_MISSES.inc(cache=namespace)
+        try:
+            value = compute()
+            if value is not None:
+                self.set(namespace, key, value, ttl=ttl)
+            return value
+        finally:
+            # 等待超时后自行计算时没有持有锁，不能释放其他调用持有的锁
+            if locked:
+                self._unlock(namespace, key, owner)
+
+    def _maybe_purge(self):
+        now = time.time()
+        if now - self._last_purge < self.PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        conn = self._conn()
+        removed = conn.execute(
+            'DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at < ?', (now,)
+        ).rowcount
+        conn.execute('DELETE FROM locks WHERE expires_at < ?', (now,))
+        if removed:
+            logger.info(f"清理过期缓存 {removed} 条")
+
+    def total_bytes(self):
+        """缓存值的总大小（字节）"""
+        return self._conn().execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def _maybe_evict(self, written):
+        """累计写入超过上限的 1/20 时检查总大小，超出上限则按访问时间淘汰到上限的 90%"""
+        if not self.max_bytes:
+            return
+        with self._written_lock:
+            self._written += written
+            if self._written < self.max_bytes // 20:
+                return
+            self._written = 0
+        self.evict(int(self.max_bytes * 0.9))
+
+    def evict(self, target_bytes):
+        """
+        淘汰最久未访问的条目，直到缓存总大小不超过 target_bytes
+
+        Returns:
+            int: 淘汰的条目数
+        """
+        conn = self._conn()
+        excess = self.total_bytes() - target_bytes
+        removed = 0
+        while excess > 0:
+            rows = conn.execute(
+                'SELECT rowid, size FROM entries ORDER BY accessed_at LIMIT 200'
+            ).fetchall()
+            if not rows:
+                break
+            victims = []
+            for rowid, size in rows:
+                victims.append((rowid,))
+                excess -= size or 0
+                if excess <= 0:
+                    break
+            conn.executemany('DELETE FROM entries WHERE rowid = ?', victims)
+            removed += len(victims)
+        if removed:
+            logger.info(f"缓存超出大小上限，淘汰 {removed} 条")
+        return removed
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """进程内共享的缓存实例，未启用缓存时返回 None"""
+    global _cache
+    if not config.CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SharedCache(config.CACHE_PATH)
+    return _cache
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+持久化任务队列
+API 将抓取/OCR 任务写入队列，任意主机上的 worker 进程领取（lease）任务、
+处理完成后确认（ack）。worker 崩溃时租约到期，任务会被其他 worker 重新领取。
+
+后端：
+1. SQLiteTaskQueue - 默认，单文件数据库（sqlite:///path/to/tasks.db），适合单机多进程
+2. RedisTaskQueue  - 任何兼容 Redis 协议的服务（redis://host:6379/0），适合多主机部署
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+
+import config
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Task:
+    """已领取的任务"""
+
+    def __init__(self, task_id, task_type, payload, attempts):
+        self.id = task_id
+        self.type = task_type
+        self.payload = payload
+        self.attempts = attempts
+
+    def __repr__(self):
+        return f"Task(id={self.id!r}, type={self.type!r}, attempts={self.attempts})"
+
+
+class TaskQueue:
+    """任务队列接口"""
+
+    def enqueue(self, task_type, payload, max_attempts=None):
+        """
+        提交任务
+
+        Args:
+            task_type (str): 任务类型
+            payload (dict): 任务参数（需可 JSON 序列化）
+            max_attempts (int): 最大尝试次数，默认 config.TASK_MAX_ATTEMPTS
+
+        Returns:
+            str: 任务ID
+        """
+        raise NotImplementedError
+
+    def lease(self, worker_id, lease_seconds=None):
+        """
+        领取一个待处理任务（包括租约已过期的任务）
+
+        Returns:
+            Task: 领取到的任务，队列为空返回 None
+        """
+        raise NotImplementedError
+
+    def extend_lease(self, task_id, worker_id, lease_seconds=None):
+        """续租，返回 False 表示租约已丢失（已过期并被他人领取）"""
+        raise NotImplementedError
+
+    def ack(self, task_id, worker_id, result=None):
+        """确认任务完成并保存结果，返回 False 表示租约已丢失"""
+        raise NotImplementedError
+
+    def fail(self, task_id, worker_id, error, retry=True):
+        """
+        标记任务失败
+
+        retry 为 True 且未达到最大尝试次数时重新排队，否则标记为最终失败。
+        返回 False 表示租约已丢失。
+        """
+        raise NotImplementedError
+
+    def get(self, task_id):
+        """查询任务状态，不存在返回 None"""
+        raise NotImplementedError
+
+    def stats(self):
+        """各状态的任务数"""
+        raise NotImplementedError
+
+
+class SQLiteTaskQueue(TaskQueue):
+    """SQLite 任务队列（WAL 模式，支持同一主机上的多个进程）"""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id TEXT PRIMARY KEY,
+                    type TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, created_at)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return _Transaction(conn)
+
+    def enqueue(self, task_type, payload, max_attempts=None):
+        task_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO tasks (id, type, payload, status, max_attempts, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (task_id, task_type, json.dumps(payload, ensure_ascii=False), QUEUED,
+                 max_attempts or config.TASK_MAX_ATTEMPTS, now, now)
+            )
+        return task_id
+
+    def lease(self, worker_id, lease_seconds=None):
+        lease_seconds = lease_seconds or config.TASK_LEASE_SECONDS
+        now = time.time()
+        with self._connect() as conn:
+            # 租约过期且已用尽尝试次数的任务直接标记失败
+            conn.execute(
+                'UPDATE tasks SET status = ?, error = ?, lease_owner = NULL, updated_at = ? '
+                'WHERE status = ? AND lease_expires < ? AND attempts >= max_attempts',
+                (FAILED, 'worker 租约过期且已达到最大尝试次数', now, LEASED, now)
+            )
+            row = conn.execute(
+                'SELECT id, type, payload, attempts FROM tasks '
+                'WHERE status = ? OR (status = ? AND lease_expires < ?) '
+                'ORDER BY created_at LIMIT 1',
+                (QUEUED, LEASED, now)
+            ).fetchone()
+            if row is None:
+                return None
+            task_id, task_type, payload, attempts = row
+            conn.execute(
+                'UPDATE tasks SET status = ?, attempts = attempts + 1, lease_owner = ?, '
+                'lease_expires = ?, updated_at = ? WHERE id = ?',
+                (LEASED, worker_id, now + lease_seconds, now, task_id)
+            )
+        return Task(task_id, task_type, json.loads(payload), attempts + 1)
+
+    def _update_leased(self, task_id, worker_id, sql, params):
+        with self._connect() as conn:
+            cursor = conn.execute(
+                sql + ' WHERE id = ? AND status = ? AND lease_owner = ?',
+                params + (task_id, LEASED, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def extend_lease(self, task_id, worker_id, lease_seconds=None):
+        lease_seconds = lease_seconds or config.TASK_LEASE_SECONDS
+        now = time.time()
+        return self._update_leased(task_id, worker_id,
+                                   'UPDATE tasks SET lease_expires = ?, updated_at = ?',
+                                   (now + lease_seconds, now))
+
+    def ack(self, task_id, worker_id, result=None):
+        return self._update_leased(
+            task_id, worker_id,
+            'UPDATE tasks SET status = ?, result = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?',
+            (DONE, json.dumps(result, ensure_ascii=False), time.time())
+        )
+
+    def fail(self, task_id, worker_id, error, retry=True):
+        return self._update_leased(
+            task_id, worker_id,
+            'UPDATE tasks SET status = CASE WHEN ? AND attempts < max_attempts THEN ? ELSE ? END, '
+            'error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?',
+            (1 if retry else 0, QUEUED, FAILED, str(error), time.time())
+        )
+
+    def get(self, task_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT id, type, payload, status, attempts, result, error, created_at, updated_at '
+                'FROM tasks WHERE id = ?', (task_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'id': row[0],
+            'type': row[1],
+            'payload': json.loads(row[2]),
+            'status': row[3],
+            'attempts': row[4],
+            'result': json.loads(row[5]) if row[5] else None,
+            'error': row[6],
+            'created_at': row[7],
+            'updated_at': row[8],
+        }
+
+    def stats(self):
+        with self._connect() as conn:
+            rows = conn.execute('SELECT status, COUNT(*) FROM tasks GROUP BY status').fetchall()
+        counts = {QUEUED: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+
+class _Transaction:
+    """以 BEGIN IMMEDIATE 包裹一组语句，保证领取任务时不会被其他进程抢占"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute('COMMIT')
+        else:
+            self.conn.execute('ROLLBACK')
+
+
+# 原子地回收过期租约并领取一个任务
+# KEYS: pending 列表, leased 有序集合；ARGV: 当前时间, 租约到期时间, worker_id, 任务键前缀
+_REDIS_LEASE_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, id in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], id)
+    local key = ARGV[4] .. id
+    if tonumber(redis.call('HGET', key, 'attempts')) >= tonumber(redis.call('HGET', key, 'max_attempts')) then
+        redis.call('HSET', key, 'status', 'failed', 'error', 'worker 租约过期且已达到最大尝试次数',
+                   'lease_owner', '', 'updated_at', ARGV[1])
+    else
+        redis.call('HSET', key, 'status', 'queued', 'lease_owner', '', 'updated_at', ARGV[1])
+        redis.call('LPUSH', KEYS[1], id)
+    end
+end
+local id = redis.call('RPOP', KEYS[1])
+if not id then
+    return nil
+end
+local key = ARGV[4] .. id
+local attempts = redis.call('HINCRBY', key, 'attempts', 1)
+redis.call('HSET', key, 'status', 'leased', 'lease_owner', ARGV[3], 'updated_at', ARGV[1])
+redis.call('ZADD', KEYS[2], ARGV[2], id)
+return {id, redis.call('HGET', key, 'type'), redis.call('HGET', key, 'payload'), attempts}
+"""
+
+# 仅当租约仍属于该 worker 时更新任务
+# KEYS: 任务键, leased 有序集合, pending 列表；ARGV: id, worker_id, 操作, 时间, 参数...
+_REDIS_UPDATE_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'status') ~= 'leased' or redis.call('HGET', KEYS[1], 'lease_owner') ~= ARGV[2] then
+    return 0
+end
+local op = ARGV[3]
+if op == 'extend' then
+    redis.call('ZADD', KEYS[2], ARGV[5], ARGV[1])
+    redis.call('HSET', KEYS[1], 'updated_at', ARGV[4])
+    return 1
+end
+redis.call('ZREM', KEYS[2], ARGV[1])
+if op == 'ack' then
+    redis.call('HSET', KEYS[1], 'status', 'done', 'result', ARGV[5], 'lease_owner', '', 'updated_at', ARGV[4])
+else
+    local retry = ARGV[6] == '1' and
+        tonumber(redis.call('HGET', KEYS[1], 'attempts')) < tonumber(redis.call('HGET', KEYS[1], 'max_attempts'))
+    if retry then
+        redis.call('HSET', KEYS[1], 'status', 'queued', 'error', ARGV[5], 'lease_owner', '', 'updated_at', ARGV[4])
+        redis.call('LPUSH', KEYS[3], ARGV[1])
+    else
+        redis.call('HSET', KEYS[1], 'status', 'failed', 'error', ARGV[5], 'lease_owner', '', 'updated_at', ARGV[4])
+    end
+end
+return 1
+"""
+
+
+class RedisTaskQueue(TaskQueue):
+    """
+    Redis 任务队列
+
+    任务详情保存在哈希 <prefix>task:<id>，待处理任务在列表 <prefix>pending 中，
+    已领取任务按租约到期时间保存在有序集合 <prefix>leased 中。
+    领取与状态变更均通过 Lua 脚本原子执行，可使用任何支持 EVAL 的 Redis 兼容服务。
+    """
+
+    def __init__(self, url, prefix='wechat:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("使用 Redis 任务队列需要安装 redis: pip install redis")
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self._pending = prefix + 'pending'
+        self._leased = prefix + 'leased'
+        self._task_prefix = prefix + 'task:'
+        self._lease_script = self.client.register_script(_REDIS_LEASE_SCRIPT)
+        self._update_script = self.client.register_script(_REDIS_UPDATE_SCRIPT)
+
+    def enqueue(self, task_type, payload, max_attempts=None):
+        task_id = uuid.uuid4().hex
+        now = time.time()
+        pipe = self.client.pipeline()
+        pipe.hset(self._task_prefix + task_id, mapping={
+            'id': task_id,
+            'type': task_type,
+            'payload': json.dumps(payload, ensure_ascii=False),
+            'status': QUEUED,
+            'attempts': 0,
+            'max_attempts': max_attempts or config.TASK_MAX_ATTEMPTS,
+            'created_at': now,
+            'updated_at': now,
+        })
+        pipe.lpush(self._pending, task_id)
+        pipe.execute()
+        return task_id
+
+    def lease(self, worker_id, lease_seconds=None):
+        lease_seconds = lease_seconds or config.TASK_LEASE_SECONDS
+        now = time.time()
+        row = self._lease_script(
+            keys=[self._pending, self._leased],
+            args=[now, now + lease_seconds, worker_id, self._task_prefix],
+        )
+        if not row:
+            return None
+        task_id, task_type, payload, attempts = row
+        return Task(task_id, task_type, json.loads(payload), int(attempts))
+
+    def _update(self, task_id, worker_id, op, *args):
+        return bool(self._update_script(
+            keys=[self._task_prefix + task_id, self._leased, self._pending],
+            args=[task_id, worker_id, op, time.time(), *args],
+        ))
+
+    def extend_lease(self, task_id, worker_id, lease_seconds=None):
+        lease_seconds = lease_seconds or config.TASK_LEASE_SECONDS
+        return self._update(task_id, worker_id, 'extend', time.time() + lease_seconds)
+
+    def ack(self, task_id, worker_id, result=None):
+        return self._update(task_id, worker_id, 'ack', json.dumps(result, ensure_ascii=False))
+
+    def fail(self, task_id, worker_id, error, retry=True):
+        return self._update(task_id, worker_id, 'fail', str(error), '1' if retry else '0')
+
+    def get(self, task_id):
+        data = self.client.hgetall(self._task_prefix + task_id)
+        if not data:
+            return None
+        return {
+            'id': data['id'],
+            'type': data['type'],
+            'payload': json.loads(data['payload']),
+            'status': data['status'],
+            'attempts': int(data['attempts']),
+            'result': json.loads(data['result']) if data.get('result') else None,
+            'error': data.get('error') or None,
+            'created_at': float(data['created_at']),
+            'updated_at': float(data['updated_at']),
+        }
+
+    def stats(self):
+        return {
+            QUEUED: self.client.llen(self._pending),
+            LEASED: self.client.zcard(self._leased),
+        }
+
+
+def create_task_queue(url=None):
+    """
+    根据 URL 创建任务队列
+
+    Args:
+        url (str): sqlite:///path/to/tasks.db 或 redis://host:port/db，默认 config.TASK_QUEUE_URL
+
+    Returns:
+        TaskQueue: 任务队列实例
+    """
+    url = url or config.TASK_QUEUE_URL
+    if url.startswith('sqlite:///'):
+        return SQLiteTaskQueue(url[len('sqlite:///'):])
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisTaskQueue(url)
+    raise ValueError(f"不支持的任务队列地址: {url}")
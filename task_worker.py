@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务队列 worker
+从持久化任务队列领取抓取/OCR任务并执行，处理期间定期续租，
+完成后确认并保存结果。可在任意数量的主机上同时运行：
+
+    python wechat_article_scraper.py --worker --queue redis://queue-host:6379/0 --workers 4
+"""
+
+import os
+import socket
+import threading
+import logging
+
+import config
+from task_queue import create_task_queue
+from wechat_article_scraper import WeChatArticleScraper, Deadline
+
+logger = logging.getLogger(__name__)
+
+# 任务类型：抓取文章并对图片进行OCR，结果为 process_article 的返回值
+TASK_ARTICLE = 'article'
+
+
+class InvalidTask(Exception):
+    """任务类型或参数无效，重试也不会成功"""
+
+
+class TaskWorker:
+    """任务队列 worker"""
+
+    def __init__(self, queue, scraper=None, worker_id=None, concurrency=1, poll_interval=None):
+        """
+        Args:
+            queue (TaskQueue): 任务队列
+            scraper (WeChatArticleScraper): 抓取器，默认新建
+            worker_id (str): worker 标识，默认为 主机名-进程号
+            concurrency (int): 并行处理任务的线程数
+            poll_interval (float): 队列为空时的轮询间隔（秒）
+        """
+        self.queue = queue
+        self.scraper = scraper or WeChatArticleScraper(output_dir=config.OUTPUT_DIR)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval or config.TASK_POLL_INTERVAL
+        self.lease_seconds = config.TASK_LEASE_SECONDS
+
+    def handle(self, task):
+        """执行任务，返回需要保存的结果"""
+        if task.type != TASK_ARTICLE:
+            raise InvalidTask(f"未知的任务类型: {task.type}")
+        payload = task.payload
+        if not payload.get('url'):
+            raise InvalidTask("任务缺少 url 参数")
+        article_info = self.scraper.process_article(
+            payload['url'],
+            with_images=payload.get('with_images', True),
+            delay=payload.get('delay', config.REQUEST_DELAY),
+            deadline=Deadline(payload.get('time_budget')),
+        )
+        if article_info is None:
+            raise RuntimeError("无法获取文章内容")
+        if article_info['partial'] and payload.get('time_budget') is None:
+            # 未设置时间预算却只处理了部分图片，说明图片下载遇到反爬验证或熔断，稍后重试
+            raise RuntimeError(f"有 {len(article_info['pending_images'])} 张图片未处理")
+        return article_info
+
+    def _heartbeat(self, task, worker_id, stop):
+        """处理期间每隔租约时长的三分之一续租一次"""
+        while not stop.wait(self.lease_seconds / 3):
+            if not self.queue.extend_lease(task.id, worker_id, self.lease_seconds):
+                logger.warning(f"任务租约已丢失，结果将被丢弃: {task.id}")
+                return
+
+    def run_once(self, worker_id=None):
+        """
+        领取并处理一个任务
+
+        Returns:
+            bool: 是否领取到任务
+        """
+        worker_id = worker_id or self.worker_id
+        task = self.queue.lease(worker_id, self.lease_seconds)
+        if task is None:
+            return False
+
+        logger.info(f"领取任务 {task.id}（第 {task.attempts} 次尝试）: {task.payload.get('url')}")
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(task, worker_id, stop), daemon=True)
+        heartbeat.start()
+        result = error = None
+        try:
+            result = self.handle(task)
+        except Exception as e:
+            error = e
+        finally:
+            # 先停止续租再更新状态，避免续租线程把已确认的任务误报为租约丢失
+            stop.set()
+            heartbeat.join()
+
+        if isinstance(error, InvalidTask):
+            logger.error(f"任务 {task.id} 参数错误，不再重试: {error}")
+            self.queue.fail(task.id, worker_id, error, retry=False)
+        elif error is not None:
+            logger.error(f"任务 {task.id} 执行失败: {error}")
+            self.queue.fail(task.id, worker_id, error, retry=True)
+        elif self.queue.ack(task.id, worker_id, result):
+            logger.info(f"任务完成: {task.id}")
+        else:
+            logger.warning(f"任务租约已丢失，未能确认: {task.id}")
+        return True
+
+    def _loop(self, worker_id, stop):
+        while not stop.is_set():
+            try:
+                if not self.run_once(worker_id):
+                    stop.wait(self.poll_interval)
+            except Exception as e:
+                # 队列暂时不可用时稍后重试，不退出 worker
+                logger.error(f"领取任务失败: {e}")
+                stop.wait(self.poll_interval)
+
+    def run(self, stop=None):
+        """持续处理任务，直到 stop 被设置（默认一直运行）"""
+        stop = stop or threading.Event()
+        threads = []
+        for i in range(self.concurrency):
+            worker_id = f"{self.worker_id}-{i + 1}"
+            thread = threading.Thread(target=self._loop, args=(worker_id, stop), name=worker_id, daemon=True)
+            thread.start()
+            threads.append(thread)
+        logger.info(f"worker {self.worker_id} 已启动，并发数 {self.concurrency}")
+        try:
+            while any(t.is_alive() for t in threads):
+                for thread in threads:
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            logger.info("收到中断信号，等待进行中的任务结束...")
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+
+def run_worker(queue_url=None, concurrency=1):
+    """worker 模式入口"""
+    TaskWorker(create_task_queue(queue_url), concurrency=concurrency).run()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API 状态码测试：文章获取失败返回400，时间预算用尽返回504，非法时间预算返回400，
+读取不存在的图片 pack 返回404 且不创建文件
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+import api_server
+import config
+from wechat_article_scraper import WeChatArticleScraper
+
+ARTICLE_URL = 'https://mp.weixin.qq.com/s/api-test'
+
+
+def unavailable(url, deadline=None):
+    """立即失败（如链接错误）"""
+    return None
+
+
+def slow_unavailable(url, deadline=None):
+    """等到预算用尽后失败（如源站无响应）"""
+    time.sleep(deadline.remaining() + 0.05)
+    return None
+
+
+class ArticleUnavailableTest(unittest.TestCase):
+
+    def setUp(self):
+        output_dir = tempfile.mkdtemp(prefix='api_test_')
+        self.addCleanup(shutil.rmtree, output_dir, ignore_errors=True)
+        for name in ('CACHE_ENABLED', 'SEARCH_INDEX_ENABLED'):
+            patcher = mock.patch.object(config, name, False)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.scraper = WeChatArticleScraper(output_dir=output_dir)
+        patcher = mock.patch.object(api_server, '_scraper', self.scraper)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = TestClient(api_server.app)
+
+    def get_info(self, fetch, **params):
+        with mock.patch.object(self.scraper, 'get_article_content', fetch):
+            return self.client.get('/article/info', params={'url': ARTICLE_URL, **params})
+
+    def save_to_feishu(self, fetch, **body):
+        with mock.patch.object(config, 'FEISHU_ENABLED', True), \
+                mock.patch.object(self.scraper, 'get_article_content', fetch):
+            return self.client.post('/article/save-to-feishu', json={'url': ARTICLE_URL, **body})
+
+    def test_info_failure_is_400(self):
+        self.assertEqual(self.get_info(unavailable).status_code, 400)
+
+    def test_info_failure_with_budget_left_is_400(self):
+        self.assertEqual(self.get_info(unavailable, time_budget=30).status_code, 400)
+
+    def test_info_budget_exhausted_is_504(self):
+        self.assertEqual(self.get_info(slow_unavailable, time_budget=0.2).status_code, 504)
+
+    def test_feishu_failure_is_400(self):
+        self.assertEqual(self.save_to_feishu(unavailable, time_budget=30).status_code, 400)
+
+    def test_feishu_budget_exhausted_is_504(self):
+        self.assertEqual(self.save_to_feishu(slow_unavailable, time_budget=0.2).status_code, 504)
+
+
+class SubmitTaskTest(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = mock.Mock()
+        self.queue.enqueue.return_value = 'task-1'
+        patcher = mock.patch.object(api_server, '_task_queue', self.queue)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = TestClient(api_server.app)
+
+    def submit(self, **body):
+        return self.client.post('/tasks', json={'url': ARTICLE_URL, **body})
+
+    def test_non_positive_budget_is_rejected(self):
+        for budget in (0, -1):
+            self.assertEqual(self.submit(time_budget=budget).status_code, 400)
+        self.queue.enqueue.assert_not_called()
+
+    def test_valid_budget_is_queued(self):
+        response = self.submit(time_budget=30)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['task_id'], 'task-1')
+        self.assertEqual(self.queue.enqueue.call_args[0][1]['time_budget'], 30)
+
+    def test_missing_budget_is_queued(self):
+        self.assertEqual(self.submit().status_code, 200)
+
+
+class GetImageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp(prefix='api_test_')
+        self.addCleanup(shutil.rmtree, self.output_dir, ignore_errors=True)
+        patcher = mock.patch.object(config, 'OUTPUT_DIR', self.output_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = TestClient(api_server.app)
+
+    def test_missing_pack_is_404_and_not_created(self):
+        pack_path = os.path.join(self.output_dir, 'missing.pack')
+        response = self.client.get('/images', params={'path': f"{pack_path}#a.png"})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(os.listdir(self.output_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
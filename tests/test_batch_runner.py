@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量模式测试：只处理了部分图片的文章不写入结果与断点，续跑时重新处理
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import config
+from batch_runner import BatchRunner
+
+
+class ListSink:
+    """把结果保存在列表中的输出，写入即落盘"""
+
+    def __init__(self):
+        self.rows = []
+
+    def write(self, article_info):
+        self.rows.append(article_info)
+        return [article_info['url']]
+
+    def close(self):
+        return []
+
+
+class FakeScraper:
+    """按链接返回预设结果的抓取器"""
+
+    def __init__(self, results):
+        self.results = results
+        self.calls = []
+
+    def process_article(self, url):
+        self.calls.append(url)
+        return self.results[url]
+
+
+def article(url, partial=False):
+    return {'url': url, 'partial': partial, 'pending_images': ['https://img/1.png'] if partial else []}
+
+
+class BatchRunnerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='batch_runner_test_')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.checkpoint = os.path.join(self.directory, 'checkpoint.txt')
+        for name in ('CACHE_ENABLED', 'SEARCH_INDEX_ENABLED'):
+            patcher = mock.patch.object(config, name, False)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_batch(self, results):
+        sink = ListSink()
+        runner = BatchRunner(sink, checkpoint_path=self.checkpoint, workers=2,
+                             output_dir=os.path.join(self.directory, 'images'))
+        runner.scraper = FakeScraper(results)
+        return runner.run(list(results)), sink, runner.scraper
+
+    def test_partial_result_is_retried_on_resume(self):
+        stats, sink, _ = self.run_batch({
+            'https://a': article('https://a'),
+            'https://b': article('https://b', partial=True),
+            'https://c': None,
+        })
+        self.assertEqual((stats['succeeded'], stats['failed']), (1, 2))
+        self.assertEqual([row['url'] for row in sink.rows], ['https://a'])
+
+        stats, sink, scraper = self.run_batch({
+            'https://a': article('https://a'),
+            'https://b': article('https://b'),
+            'https://c': article('https://c'),
+        })
+        self.assertEqual(sorted(scraper.calls), ['https://b', 'https://c'])
+        self.assertEqual((stats['succeeded'], stats['skipped']), (2, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
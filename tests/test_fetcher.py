@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+反爬验证页识别测试：验证页被识别，正文中提到“环境异常”等字样的普通文章正常解析
+熔断器测试：半开状态下的探测请求以意外异常结束时归还探测名额
+退避测试：Retry-After 不超过 RETRY_AFTER_MAX
+"""
+
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+import config
+import fetcher
+from wechat_article_scraper import WeChatArticleScraper
+
+ARTICLE_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<title>公众号操作频繁被限制？环境异常怎么办</title>
+<meta property="og:title" content="公众号操作频繁被限制？环境异常怎么办">
+</head>
+<body>
+<h1 class="rich_media_title" id="activity-name">公众号操作频繁被限制？环境异常怎么办</h1>
+<div class="rich_media_meta_list">
+  <a id="js_name">测试公众号</a>
+  <em id="publish_time">2024-01-01</em>
+</div>
+<div class="rich_media_content" id="js_content">
+<p>文章提到操作频繁的问题，以及访问过于频繁时出现的提示。</p>
+</div>
+</body>
+</html>
+"""
+
+VERIFY_HTML = """<!DOCTYPE html>
+<html>
+<head><title>微信公众平台</title></head>
+<body>
+<div class="weui-msg">
+  <h2 class="weui-msg__title">环境异常</h2>
+  <p class="weui-msg__desc">当前环境异常，完成验证后即可继续访问。</p>
+  <a id="js_verify" class="weui-btn weui-btn_primary">去验证</a>
+</div>
+</body>
+</html>
+"""
+
+
+def make_response(url, html, status=200):
+    response = requests.Response()
+    response.status_code = status
+    response.url = url
+    response.headers['Content-Type'] = 'text/html; charset=utf-8'
+    response._content = html.encode('utf-8')
+    response.encoding = 'utf-8'
+    return response
+
+
+class FakeSession:
+    """按链接返回预设响应的会话"""
+
+    def __init__(self, responses):
+        self.responses = responses
+
+    def get(self, url, headers=None, timeout=None):
+        return self.responses[url]
+
+
+class DetectBlockTest(unittest.TestCase):
+
+    def test_article_mentioning_markers_is_not_blocked(self):
+        response = make_response('https://mp.weixin.qq.com/s/article', ARTICLE_HTML)
+        self.assertIsNone(fetcher.detect_block(response))
+
+    def test_verify_page_is_blocked(self):
+        response = make_response('https://mp.weixin.qq.com/s/article', VERIFY_HTML)
+        self.assertIsNotNone(fetcher.detect_block(response))
+
+    def test_marker_without_article_content_is_blocked(self):
+        response = make_response('https://mp.weixin.qq.com/s/article', '<html><body><p>访问过于频繁，请稍后再试</p></body></html>')
+        self.assertEqual(fetcher.detect_block(response), '访问过于频繁')
+
+    def test_captcha_redirect_is_blocked(self):
+        response = make_response('https://mp.weixin.qq.com/mp/wappoc_appmsgcaptcha?target_url=x', '<html></html>')
+        self.assertIsNotNone(fetcher.detect_block(response))
+
+    def test_captcha_in_query_is_not_blocked(self):
+        response = make_response('https://mp.weixin.qq.com/s/article?from=captcha', ARTICLE_HTML)
+        self.assertIsNone(fetcher.detect_block(response))
+
+    def test_non_html_is_not_checked(self):
+        response = make_response('https://mmbiz.qpic.cn/a.png', '环境异常')
+        response.headers['Content-Type'] = 'image/png'
+        self.assertIsNone(fetcher.detect_block(response))
+
+
+class ArticleWithMarkersTest(unittest.TestCase):
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp(prefix='fetcher_test_')
+        self.addCleanup(shutil.rmtree, self.output_dir, ignore_errors=True)
+        for name in ('CACHE_ENABLED', 'SEARCH_INDEX_ENABLED'):
+            patcher = mock.patch.object(config, name, False)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def scrape(self, host, html):
+        url = f"https://{host}/s/article"
+        scraper = WeChatArticleScraper(output_dir=self.output_dir)
+        scraper._local.session = FakeSession({url: make_response(url, html)})
+        return scraper.get_article_content(url)
+
+    def test_article_mentioning_markers_parses(self):
+        host = 'article-markers.test'
+        article_info = self.scrape(host, ARTICLE_HTML)
+        self.assertIsNotNone(article_info)
+        self.assertEqual(article_info['title'], '公众号操作频繁被限制？环境异常怎么办')
+        self.assertIn('访问过于频繁', article_info['content'])
+        # 正常文章不应降低主机的并发上限
+        limiter = fetcher.get_limiter(host)
+        self.assertGreaterEqual(limiter.limit, config.ADAPTIVE_CONCURRENCY_INITIAL)
+
+    def test_verify_page_is_not_parsed(self):
+        self.assertIsNone(self.scrape('verify-page.test', VERIFY_HTML))
+
+
+class RaisingSession:
+    """每次请求都抛出指定异常的会话"""
+
+    def __init__(self, error):
+        self.error = error
+
+    def get(self, url, headers=None, timeout=None):
+        raise self.error
+
+
+class HalfOpenProbeTest(unittest.TestCase):
+
+    def half_open_breaker(self, host):
+        breaker = fetcher.get_breaker(host)
+        breaker.state = fetcher.OPEN
+        breaker.opened_at = time.monotonic() - breaker.reset_timeout
+        return breaker
+
+    def assert_probe_released(self, host, error):
+        breaker = self.half_open_breaker(host)
+        with self.assertRaises(type(error)):
+            fetcher.fetch(RaisingSession(error), f"https://{host}/s/article", max_retries=0)
+        self.assertEqual(breaker.state, fetcher.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+
+    def test_chunked_encoding_error_releases_probe(self):
+        self.assert_probe_released('probe-chunked.test', requests.exceptions.ChunkedEncodingError('truncated'))
+
+    def test_too_many_redirects_releases_probe(self):
+        self.assert_probe_released('probe-redirects.test', requests.TooManyRedirects('loop'))
+
+    def test_value_error_releases_probe(self):
+        self.assert_probe_released('probe-value.test', ValueError('Attempted to set connect timeout to 0'))
+
+    def test_limiter_timeout_releases_probe(self):
+        host = 'probe-limiter.test'
+        breaker = self.half_open_breaker(host)
+        limiter = fetcher.get_limiter(host)
+        limiter.in_flight = int(limiter.limit)
+        self.addCleanup(setattr, limiter, 'in_flight', 0)
+        deadline = mock.Mock()
+        deadline.remaining.return_value = 0.0
+        with mock.patch.object(config, 'ADAPTIVE_CONCURRENCY_ENABLED', True), self.assertRaises(requests.Timeout):
+            fetcher.fetch(RaisingSession(AssertionError('不应发出请求')), f"https://{host}/s/article", deadline=deadline)
+        self.assertTrue(breaker.allow())
+
+    def test_other_thread_probe_is_kept(self):
+        breaker = self.half_open_breaker('probe-thread.test')
+        thread = threading.Thread(target=breaker.allow)
+        thread.start()
+        thread.join()
+        breaker.release_probe()
+        self.assertFalse(breaker.allow())
+
+
+class BackoffTest(unittest.TestCase):
+
+    def response_with_retry_after(self, value):
+        response = make_response('https://mp.weixin.qq.com/s/article', '', status=429)
+        response.headers['Retry-After'] = value
+        return response
+
+    def test_retry_after_is_honored(self):
+        self.assertGreaterEqual(fetcher._backoff(0, self.response_with_retry_after('3')), 3)
+
+    def test_retry_after_is_capped(self):
+        with mock.patch.object(config, 'RETRY_AFTER_MAX', 5):
+            self.assertEqual(fetcher._backoff(0, self.response_with_retry_after('86400')), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片 pack 存储测试：记录与索引格式、索引重建、压缩，以及多个实例（进程）之间的一致性
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+
+import image_store
+from image_store import ImagePack
+
+
+def _put_many(path, worker, count):
+    pack = ImagePack(path)
+    for i in range(count):
+        pack.put(f"w{worker}_{i}.png", f"worker {worker} image {i}".encode('utf-8') * 50)
+
+
+class ImagePackTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='image_store_test_')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.path = os.path.join(self.directory, 'article.pack')
+
+    def test_put_get_and_dedupe(self):
+        pack = ImagePack(self.path)
+        ref = pack.put('image_1.png', b'one')
+        self.assertEqual(ref, f"{self.path}#image_1.png")
+        self.assertEqual(image_store.split_ref(ref), (self.path, 'image_1.png'))
+        self.assertEqual(bytes(image_store.read_image(ref)), b'one')
+
+        size = os.path.getsize(self.path)
+        pack.put('image_1.png', b'one')
+        self.assertEqual(os.path.getsize(self.path), size)
+        pack.put('image_1.png', b'changed')
+        self.assertEqual(bytes(pack.get('image_1.png')), b'changed')
+
+    def test_delete(self):
+        pack = ImagePack(self.path)
+        pack.put('a.png', b'a' * 100)
+        pack.delete('a.png')
+        with self.assertRaises(KeyError):
+            pack.get('a.png')
+        self.assertEqual(ImagePack(self.path).names(), [])
+
+    def test_rebuilds_missing_or_foreign_index(self):
+        pack = ImagePack(self.path)
+        pack.put('a.png', b'a' * 100)
+        pack.put('b.png', b'b' * 200)
+        pack.delete('a.png')
+
+        os.remove(pack.index_path)
+        rebuilt = ImagePack(self.path)
+        self.assertEqual(rebuilt.names(), ['b.png'])
+        self.assertEqual(bytes(rebuilt.get('b.png')), b'b' * 200)
+        # 下一次写入时重建索引文件
+        rebuilt.put('c.png', b'c')
+        self.assertTrue(os.path.exists(pack.index_path))
+        self.assertEqual(sorted(ImagePack(self.path).names()), ['b.png', 'c.png'])
+
+        # 属于其他 pack（代号不同）的索引被忽略
+        with open(pack.index_path, 'r+b') as f:
+            f.seek(8)
+            f.write(b'\0' * 8)
+        self.assertEqual(sorted(ImagePack(self.path).names()), ['b.png', 'c.png'])
+
+    def test_index_tracks_records_appended_by_other_instance(self):
+        reader = ImagePack(self.path)
+        writer = ImagePack(self.path)
+        writer.put('a.png', b'a' * 10)
+        self.assertEqual(bytes(reader.get('a.png')), b'a' * 10)
+        writer.delete('a.png')
+        self.assertEqual(reader.names(), [])
+
+    def test_compact_reclaims_space(self):
+        pack = ImagePack(self.path)
+        pack.put('a.png', b'a' * 1000)
+        pack.put('b.png', b'b' * 1000)
+        pack.put('b.png', b'B' * 1000)
+        pack.delete('a.png')
+        before = os.path.getsize(self.path)
+        reclaimed = pack.compact()
+        self.assertEqual(reclaimed, before - os.path.getsize(self.path))
+        self.assertGreaterEqual(reclaimed, 2000)
+        stats = pack.stats()
+        self.assertEqual(stats['compacted_bytes'], stats['file_bytes'])
+        self.assertEqual(bytes(pack.get('b.png')), b'B' * 1000)
+        self.assertEqual(ImagePack(self.path).names(), ['b.png'])
+
+    def test_reader_opened_before_compaction(self):
+        writer = ImagePack(self.path)
+        writer.put('a.png', b'a' * 1000)
+        writer.put('b.png', b'b' * 500)
+        writer.delete('a.png')
+        # 另一个进程在压缩前加载了索引，尚未读取过数据
+        reader = ImagePack(self.path)
+        writer.compact()
+        self.assertEqual(bytes(reader.get('b.png')), b'b' * 500)
+
+    def test_reader_never_returns_other_image_after_compaction(self):
+        writer = ImagePack(self.path)
+        writer.put('a.png', b'a' * 1000)
+        writer.put('b.png', b'b' * 500)
+        writer.delete('a.png')
+        reader = ImagePack(self.path)
+        # 压缩后的 pack 比读取方记录的偏移更长
+        writer.compact()
+        writer.put('c.png', b'c' * 3000)
+        self.assertEqual(bytes(reader.get('b.png')), b'b' * 500)
+        self.assertEqual(bytes(reader.get('c.png')), b'c' * 3000)
+
+        mapped = ImagePack(self.path)
+        self.assertEqual(bytes(mapped.get('b.png')), b'b' * 500)
+        writer.delete('b.png')
+        writer.compact()
+        with self.assertRaises(KeyError):
+            mapped.get('b.png')
+        self.assertEqual(bytes(mapped.get('c.png')), b'c' * 3000)
+
+    def test_view_held_across_compaction(self):
+        writer = ImagePack(self.path)
+        writer.put('a.png', b'a' * 100)
+        writer.put('b.png', b'b' * 100)
+        reader = ImagePack(self.path)
+        view = reader.get('b.png')
+        writer.delete('a.png')
+        writer.compact()
+        # 已取得的视图仍指向原来的数据
+        self.assertEqual(bytes(view), b'b' * 100)
+
+    def test_concurrent_writers(self):
+        context = multiprocessing.get_context()
+        processes = [context.Process(target=_put_many, args=(self.path, worker, 30)) for worker in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual([process.exitcode for process in processes], [0] * 4)
+
+        pack = ImagePack(self.path)
+        self.assertEqual(len(pack.names()), 120)
+        for worker in range(4):
+            for i in range(30):
+                expected = f"worker {worker} image {i}".encode('utf-8') * 50
+                self.assertEqual(bytes(pack.get(f"w{worker}_{i}.png")), expected)
+
+    def test_compact_all(self):
+        pack = ImagePack(self.path)
+        pack.put('a.png', b'a' * 1000)
+        pack.delete('a.png')
+        other = ImagePack(os.path.join(self.directory, 'other.pack'))
+        other.put('b.png', b'b' * 1000)
+        result = image_store.compact_all(self.directory, min_waste=0.2)
+        self.assertEqual((result['packs'], result['compacted']), (2, 1))
+        self.assertGreater(result['reclaimed_bytes'], 1000)
+
+    def test_read_missing_pack_does_not_create_it(self):
+        with self.assertRaises(FileNotFoundError):
+            image_store.read_image(f"{self.path}#a.png")
+        self.assertFalse(os.path.exists(self.path))
+        self.assertFalse(os.path.exists(self.path[:-len(image_store.PACK_SUFFIX)] + image_store.INDEX_SUFFIX))
+
+
+if __name__ == '__main__':
+    unittest.main()
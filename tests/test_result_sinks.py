@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSONL 输出测试：进程被杀死后续跑，压缩文件仍可完整解压
+"""
+
+import gzip
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import unittest
+import zlib
+
+from result_sinks import JsonlSink
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def record(n):
+    return {'url': f"https://mp.weixin.qq.com/s/{n}", 'title': f"文章 {n}", 'content': '正文' * 50}
+
+
+def _write_and_die(path, compression, count):
+    sink = JsonlSink(path, compression=compression)
+    for n in range(count):
+        sink.write(record(n))
+    # 模拟进程被杀死：不关闭输出
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+class JsonlSinkResumeCases:
+    """各压缩方式共用的续跑测试"""
+
+    compression = None
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='result_sinks_test_')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.path = os.path.join(self.directory, 'results.jsonl')
+
+    def read(self):
+        raise NotImplementedError
+
+    def compress(self, data):
+        raise NotImplementedError
+
+    def urls(self):
+        return [json.loads(line)['url'] for line in self.read().splitlines()]
+
+    def resume(self, start, count):
+        with JsonlSink(self.path, compression=self.compression) as sink:
+            for n in range(start, start + count):
+                sink.write(record(n))
+
+    def test_resume_after_kill(self):
+        process = multiprocessing.get_context('fork').Process(
+            target=_write_and_die, args=(self.path, self.compression, 3)
+        )
+        process.start()
+        process.join()
+        self.assertEqual(process.exitcode, -signal.SIGKILL)
+
+        self.resume(3, 2)
+        self.assertEqual(self.urls(), [record(n)['url'] for n in range(5)])
+
+    def test_resume_after_kill_mid_record(self):
+        self.resume(0, 2)
+        # 最后一条记录只写入了一半
+        partial = self.compress((json.dumps(record(2), ensure_ascii=False) + '\n').encode('utf-8'))
+        with open(self.path, 'ab') as f:
+            f.write(partial[:len(partial) // 2])
+
+        self.resume(3, 1)
+        self.assertEqual(self.urls(), [record(n)['url'] for n in (0, 1, 3)])
+
+
+class PlainJsonlSinkTest(JsonlSinkResumeCases, unittest.TestCase):
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def compress(self, data):
+        return data
+
+
+class GzipJsonlSinkTest(JsonlSinkResumeCases, unittest.TestCase):
+
+    compression = 'gzip'
+
+    def read(self):
+        with gzip.open(self.path, 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def compress(self, data):
+        return gzip.compress(data)
+
+    def test_recovers_unterminated_stream(self):
+        # 旧版本写入的、同步刷新但没有结束的 gzip 流
+        compressor = zlib.compressobj(wbits=31)
+        data = b''
+        for n in range(3):
+            data += compressor.compress((json.dumps(record(n), ensure_ascii=False) + '\n').encode('utf-8'))
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+        with open(self.path, 'wb') as f:
+            f.write(data + b'\x00\x01')
+
+        self.resume(3, 1)
+        self.assertEqual(self.urls(), [record(n)['url'] for n in range(4)])
+
+
+@unittest.skipIf(zstandard is None, "未安装 zstandard")
+class ZstdJsonlSinkTest(JsonlSinkResumeCases, unittest.TestCase):
+
+    compression = 'zstd'
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            reader = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+            return io.TextIOWrapper(reader, encoding='utf-8').read()
+
+    def compress(self, data):
+        return zstandard.ZstdCompressor().compress(data)
+
+    def test_recovers_unterminated_stream(self):
+        with open(self.path, 'wb') as raw:
+            writer = zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+            for n in range(3):
+                writer.write((json.dumps(record(n), ensure_ascii=False) + '\n').encode('utf-8'))
+                writer.flush(zstandard.FLUSH_BLOCK)
+
+        self.resume(3, 1)
+        self.assertEqual(self.urls(), [record(n)['url'] for n in range(4)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全文检索测试：中文子串与单字查询（包括片段末尾的字）、旧版本索引重建
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import search_index
+from search_index import SearchIndex
+
+
+def article(n, title, account_name='基准测试公众号', content='正文内容'):
+    return {
+        'url': f"https://mp.weixin.qq.com/s/{n}",
+        'title': title,
+        'account_name': account_name,
+        'publish_date': '2024-01-01',
+        'content': content,
+    }
+
+
+class SearchIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='search_index_test_')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.path = os.path.join(self.directory, 'search.db')
+        self.index = SearchIndex(self.path)
+        self.index.add(article(1, '性能优化实践'), ['图片中的文字'])
+        self.index.add(article(2, '数据库索引', account_name='另一个号', content='Python 与 SQLite'))
+
+    def urls(self, query, **kwargs):
+        return sorted(hit['url'].rsplit('/', 1)[-1] for hit in self.index.search(query, **kwargs))
+
+    def test_substring_queries(self):
+        self.assertEqual(self.urls('公众号'), ['1'])
+        self.assertEqual(self.urls('优化'), ['1'])
+        self.assertEqual(self.urls('sqlite'), ['2'])
+        self.assertEqual(self.urls('图片 文字'), ['1'])
+        self.assertEqual(self.urls('公众号 sqlite'), [])
+
+    def test_single_character_anywhere_in_run(self):
+        # “号”在两篇文章的公众号名称中都位于片段末尾
+        self.assertEqual(self.urls('号'), ['1', '2'])
+        self.assertEqual(self.urls('性'), ['1'])
+        self.assertEqual(self.urls('践'), ['1'])
+        self.assertEqual(self.urls('字'), ['1'])
+
+    def test_unchanged_article_is_skipped(self):
+        self.assertFalse(self.index.add(article(1, '性能优化实践'), ['图片中的文字']))
+        self.assertTrue(self.index.add(article(1, '性能优化实践（修订）')))
+        # 未做OCR时保留已索引的OCR文本
+        self.assertEqual(self.urls('文字'), ['1'])
+
+    def test_rebuilds_index_from_older_tokenizer(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute('PRAGMA user_version = 1')
+        conn.execute("UPDATE documents_fts SET account_name = '基准 准测 测试 试公 公众 众号' WHERE rowid = 1")
+        conn.commit()
+        conn.close()
+
+        reopened = SearchIndex(self.path)
+        self.assertEqual(len(reopened.search('号')), 2)
+        conn = sqlite3.connect(self.path)
+        self.assertEqual(conn.execute('PRAGMA user_version').fetchone()[0], search_index.TOKENIZER_VERSION)
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享缓存测试：计算锁只由持有者释放，总大小超出上限时按访问时间淘汰
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from shared_cache import SharedCache
+
+
+class SharedCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='shared_cache_test_')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.path = os.path.join(self.directory, 'cache.db')
+
+    def test_compute_once(self):
+        cache = SharedCache(self.path, poll_interval=0.01)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return {'value': 1}
+
+        threads = [threading.Thread(target=cache.get_or_compute, args=('ocr', 'k', compute)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.get('ocr', 'k'), (True, {'value': 1}))
+
+    def test_waiter_timeout_keeps_holder_lock(self):
+        cache = SharedCache(self.path, poll_interval=0.01)
+        holder_started = threading.Event()
+        release_holder = threading.Event()
+
+        def slow():
+            holder_started.set()
+            release_holder.wait(5)
+            return 'holder'
+
+        holder = threading.Thread(target=cache.get_or_compute, args=('article', 'k', slow))
+        holder.start()
+        holder_started.wait(5)
+        # 同一进程的另一个线程等待超时后自行计算，结束时不能释放持有者的锁
+        self.assertEqual(cache.get_or_compute('article', 'k', lambda: None, wait_timeout=0.05), None)
+        self.assertFalse(cache._try_lock('article', 'k', 'someone-else'))
+
+        release_holder.set()
+        holder.join()
+        self.assertTrue(cache._try_lock('article', 'k', 'someone-else'))
+
+    def test_evicts_least_recently_used(self):
+        cache = SharedCache(self.path, max_bytes=10 * 1024)
+        for n in range(8):
+            cache.set('image', f"img-{n}", bytes(1024))
+            time.sleep(0.001)
+        # 读取刷新访问时间
+        cache.TOUCH_INTERVAL = 0
+        self.assertTrue(cache.get('image', 'img-0')[0])
+
+        for n in range(8, 16):
+            cache.set('image', f"img-{n}", bytes(1024))
+        self.assertLessEqual(cache.total_bytes(), 10 * 1024)
+        self.assertTrue(cache.get('image', 'img-0')[0])
+        self.assertFalse(cache.get('image', 'img-1')[0])
+        self.assertTrue(cache.get('image', 'img-15')[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
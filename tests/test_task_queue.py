@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务队列测试：租约过期回收、续租、失败重试与最大尝试次数
+SQLite 后端使用临时目录；Redis 后端使用 fakeredis（未安装时跳过）
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import task_queue
+from task_queue import DONE, FAILED, LEASED, QUEUED
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+# 测试用的短租约（秒）
+LEASE = 0.05
+
+
+class TaskQueueCases:
+    """两种后端共用的测试用例"""
+
+    def create_queue(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.queue = self.create_queue()
+
+    def expire_lease(self):
+        time.sleep(LEASE * 2)
+
+    def test_lease_and_ack(self):
+        task_id = self.queue.enqueue('article', {'url': 'https://example.com/s/1'})
+        task = self.queue.lease('w1', LEASE)
+        self.assertEqual(task.id, task_id)
+        self.assertEqual(task.payload, {'url': 'https://example.com/s/1'})
+        self.assertEqual(task.attempts, 1)
+        self.assertEqual(self.queue.get(task_id)['status'], LEASED)
+        self.assertIsNone(self.queue.lease('w2', LEASE))
+
+        self.assertTrue(self.queue.ack(task_id, 'w1', {'title': '标题'}))
+        info = self.queue.get(task_id)
+        self.assertEqual(info['status'], DONE)
+        self.assertEqual(info['result'], {'title': '标题'})
+
+    def test_expired_lease_is_reclaimed(self):
+        task_id = self.queue.enqueue('article', {})
+        self.queue.lease('w1', LEASE)
+        self.expire_lease()
+
+        task = self.queue.lease('w2', LEASE)
+        self.assertEqual(task.id, task_id)
+        self.assertEqual(task.attempts, 2)
+        # 原 worker 的租约已丢失，不能再确认或续租
+        self.assertFalse(self.queue.ack(task_id, 'w1'))
+        self.assertFalse(self.queue.extend_lease(task_id, 'w1', LEASE))
+        self.assertTrue(self.queue.ack(task_id, 'w2'))
+        self.assertEqual(self.queue.get(task_id)['status'], DONE)
+
+    def test_extend_lease_prevents_reclaim(self):
+        task_id = self.queue.enqueue('article', {})
+        self.queue.lease('w1', LEASE)
+        self.assertTrue(self.queue.extend_lease(task_id, 'w1', 60))
+        self.expire_lease()
+        self.assertIsNone(self.queue.lease('w2', LEASE))
+        self.assertTrue(self.queue.ack(task_id, 'w1'))
+
+    def test_expired_lease_at_max_attempts_fails(self):
+        task_id = self.queue.enqueue('article', {}, max_attempts=2)
+        for worker_id in ('w1', 'w2'):
+            self.assertEqual(self.queue.lease(worker_id, LEASE).id, task_id)
+            self.expire_lease()
+
+        self.assertIsNone(self.queue.lease('w3', LEASE))
+        info = self.queue.get(task_id)
+        self.assertEqual(info['status'], FAILED)
+        self.assertEqual(info['attempts'], 2)
+        self.assertIn('最大尝试次数', info['error'])
+
+    def test_fail_retries_until_max_attempts(self):
+        task_id = self.queue.enqueue('article', {}, max_attempts=3)
+        for attempt in range(1, 4):
+            task = self.queue.lease('w1', LEASE)
+            self.assertEqual((task.id, task.attempts), (task_id, attempt))
+            self.assertTrue(self.queue.fail(task_id, 'w1', f"错误 {attempt}"))
+            expected = QUEUED if attempt < 3 else FAILED
+            self.assertEqual(self.queue.get(task_id)['status'], expected)
+
+        self.assertIsNone(self.queue.lease('w1', LEASE))
+        self.assertEqual(self.queue.get(task_id)['error'], '错误 3')
+
+    def test_fail_without_retry(self):
+        task_id = self.queue.enqueue('article', {})
+        self.queue.lease('w1', LEASE)
+        self.assertFalse(self.queue.fail(task_id, 'w2', '不是租约持有者'))
+        self.assertTrue(self.queue.fail(task_id, 'w1', '无效链接', retry=False))
+        self.assertEqual(self.queue.get(task_id)['status'], FAILED)
+        self.assertIsNone(self.queue.lease('w1', LEASE))
+
+    def test_tasks_leased_in_order(self):
+        ids = [self.queue.enqueue('article', {'n': n}) for n in range(3)]
+        leased = [self.queue.lease('w1', LEASE).id for _ in ids]
+        self.assertEqual(leased, ids)
+
+
+class SQLiteTaskQueueTest(TaskQueueCases, unittest.TestCase):
+
+    def create_queue(self):
+        directory = tempfile.mkdtemp(prefix='task_queue_test_')
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        return task_queue.create_task_queue(f"sqlite:///{os.path.join(directory, 'tasks.db')}")
+
+    def test_stats(self):
+        self.queue.enqueue('article', {})
+        done_id = self.queue.enqueue('article', {})
+        self.queue.lease('w1', LEASE)
+        self.queue.ack(self.queue.lease('w1', LEASE).id, 'w1')
+        self.assertEqual(self.queue.get(done_id)['status'], DONE)
+        self.assertEqual(self.queue.stats(), {QUEUED: 0, LEASED: 1, DONE: 1, FAILED: 0})
+
+
+@unittest.skipIf(fakeredis is None, "未安装 fakeredis")
+class RedisTaskQueueTest(TaskQueueCases, unittest.TestCase):
+
+    def create_queue(self):
+        server = fakeredis.FakeServer()
+        client = fakeredis.FakeRedis(server=server, decode_responses=True)
+        with mock.patch('redis.Redis.from_url', return_value=client):
+            return task_queue.create_task_queue('redis://localhost:6379/0')
+
+
+if __name__ == '__main__':
+    unittest.main()
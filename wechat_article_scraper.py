@@ -10,18 +10,30 @@
 5. 输出所有信息到控制台
 """
 
+import argparse
+import asyncio
+import hashlib
+import shutil
+import threading
+import uuid
+from concurrent.futures import TimeoutError as FutureTimeoutError
 import requests
 import re
 import os
 import time
 from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup
 import json
-from PIL import Image
-import pytesseract
 from io import BytesIO
 import logging
 import config
+import fetcher
+import image_store
+import metrics
+import ocr_scheduler
+import profiling
+import search_index
+import shared_cache
+from ocr_scheduler import SchedulerBusy
 
 # 配置日志
 logging.basicConfig(
@@ -30,17 +42,74 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+class DeadlineExceeded(Exception):
+    """处理时间预算已用尽"""
+
+
+class Deadline:
+    """
+    单次处理的时间预算
+
+    抓取、下载与OCR各阶段都以剩余时间作为超时上限，预算用尽后停止后续工作。
+    """
+
+    def __init__(self, budget=None):
+        """
+        Args:
+            budget (float): 时间预算（秒），为空表示不限时
+        """
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget if budget else None
+        self.cancelled = False
+
+    def remaining(self):
+        """剩余时间（秒），不限时返回 None"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        """预算用尽或已取消"""
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def timed_out(self):
+        """预算在取消之前就已用尽（区分超时与调用方主动取消）"""
+        return self.expired() and not self.cancelled
+
+    def timeout(self, default):
+        """取默认超时与剩余时间中较小者"""
+        remaining = self.remaining()
+        return default if remaining is None else min(default, remaining)
+
+    def cancel(self):
+        """立即到期，正在进行的处理会在下一个检查点停止；取消前已超时的仍记为超时"""
+        if not self.expired():
+            self.cancelled = True
+        self.expires_at = time.monotonic()
+
+
 class WeChatArticleScraper:
     """微信公众号文章抓取器"""
     
+    # 'ttl' 清理策略下两次扫描之间的最小间隔（秒）
+    SWEEP_INTERVAL = 60
+
     def __init__(self, output_dir="downloaded_images"):
         """
         初始化抓取器
         
+        同一个实例可在多个线程中并发使用：每个线程持有独立的 requests 会话，
+        每篇文章的图片写入独立的工作目录（见 config.IMAGE_WORKSPACE_MODE）。
+        
         Args:
             output_dir (str): 图片下载目录
         """
-        self.session = requests.Session()
+        self._local = threading.local()
+        self._sweep_lock = threading.Lock()
+        self._last_sweep = 0.0
+        self.cache = shared_cache.get_cache()
+        self.search_index = search_index.get_index()
         self.output_dir = output_dir
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -53,35 +122,126 @@ class WeChatArticleScraper:
         
         # 创建输出目录
         if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+            os.makedirs(output_dir, exist_ok=True)
             logger.info(f"创建图片下载目录: {output_dir}")
     
-    def get_article_content(self, url):
+    @property
+    def session(self):
+        """当前线程的 requests 会话（Session 不是线程安全的）"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+    
+    def create_workspace(self, url):
+        """
+        为一篇文章创建图片工作目录
+        
+        config.IMAGE_STORAGE 为 'pack' 时工作区是一个 pack 文件（首次写入图片时创建）。
+        
+        Args:
+            url (str): 文章链接
+            
+        Returns:
+            str: 工作目录或 pack 文件路径
+        """
+        name = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+        # 处理结束后立即删除的工作目录不能与其他请求共用，否则会删掉并发请求正在写入的图片
+        if config.IMAGE_WORKSPACE_MODE == 'request' or config.IMAGE_CLEANUP_POLICY == 'after_request':
+            name = f"{name}-{uuid.uuid4().hex[:8]}"
+        workspace = os.path.join(self.output_dir, name)
+        if config.IMAGE_STORAGE == 'pack':
+            workspace += image_store.PACK_SUFFIX
+            if os.path.exists(workspace):
+                os.utime(workspace)
+            return workspace
+        os.makedirs(workspace, exist_ok=True)
+        # 刷新修改时间，避免正在使用的目录被 TTL 清理
+        os.utime(workspace)
+        return workspace
+    
+    def release_workspace(self, workspace):
+        """处理结束后按清理策略处理工作目录"""
+        if config.IMAGE_CLEANUP_POLICY == 'after_request':
+            if image_store.is_pack(workspace):
+                image_store.remove_pack(workspace)
+            else:
+                shutil.rmtree(workspace, ignore_errors=True)
+        elif config.IMAGE_CLEANUP_POLICY == 'ttl':
+            self.sweep_workspaces()
+    
+    def sweep_workspaces(self, max_age=None, force=False):
+        """
+        删除超过保留时长未使用的工作目录（及图片 pack）
+        
+        Args:
+            max_age (float): 保留时长（秒），默认取 config.IMAGE_WORKSPACE_TTL
+            force (bool): 忽略扫描间隔立即执行
+            
+        Returns:
+            int: 删除的目录数
+        """
+        now = time.time()
+        with self._sweep_lock:
+            if not force and now - self._last_sweep < self.SWEEP_INTERVAL:
+                return 0
+            self._last_sweep = now
+        max_age = config.IMAGE_WORKSPACE_TTL if max_age is None else max_age
+        removed = 0
+        for entry in os.scandir(self.output_dir):
+            try:
+                if now - entry.stat().st_mtime <= max_age:
+                    continue
+                if entry.is_dir():
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    removed += 1
+                elif image_store.is_pack(entry.name):
+                    image_store.remove_pack(entry.path)
+                    removed += 1
+            except OSError:
+                # 其他进程可能同时在清理
+                continue
+        if removed:
+            logger.info(f"清理过期图片工作目录 {removed} 个")
+        return removed
+    
+    def _cached(self, namespace, key, compute, ttl, deadline=None):
+        """通过共享缓存获取结果，未启用缓存时直接计算"""
+        if self.cache is None:
+            return compute()
+        wait_timeout = deadline.remaining() if deadline else None
+        return self.cache.get_or_compute(namespace, key, compute, ttl=ttl, wait_timeout=wait_timeout)
+    
+    def get_article_content(self, url, deadline=None):
         """
         获取文章内容
         
         Args:
             url (str): 微信公众号文章链接
+            deadline (Deadline): 时间预算，为空表示不限时
             
         Returns:
             dict: 包含文章信息的字典
         """
+        deadline = deadline or Deadline()
         try:
             logger.info(f"开始抓取文章: {url}")
-            response = self.session.get(url, headers=self.headers, timeout=30)
-            response.raise_for_status()
-            response.encoding = 'utf-8'
+            if deadline.expired():
+                raise DeadlineExceeded("时间预算已用尽")
             
-            soup = BeautifulSoup(response.text, 'html.parser')
+            def fetch():
+                with metrics.FETCH_SECONDS.time():
+                    response = fetcher.fetch(self.session, url, headers=self.headers, deadline=deadline)
+                response.encoding = 'utf-8'
+                metrics.BYTES_DOWNLOADED.inc(len(response.content), kind='article')
+                
+                # 解析库在首次使用时才导入，缩短 API 冷启动时间
+                from bs4 import BeautifulSoup
+                with metrics.PARSE_SECONDS.time():
+                    soup = BeautifulSoup(response.text, 'html.parser')
+                    return self._parse_article(url, soup)
             
-            # 提取文章信息
-            article_info = {
-                'url': url,
-                'title': self._extract_title(soup),
-                'content': self._extract_content(soup),
-                'images': self._extract_images(soup),
-                'ocr_results': []
-            }
+            article_info = self._cached('article', url, fetch, config.CACHE_ARTICLE_TTL, deadline)
             
             logger.info(f"成功提取文章标题: {article_info['title']}")
             logger.info(f"成功提取正文内容，长度: {len(article_info['content'])} 字符")
@@ -93,6 +253,20 @@ class WeChatArticleScraper:
             logger.error(f"抓取文章失败: {str(e)}")
             return None
     
+    def _parse_article(self, url, soup):
+        """从页面中提取文章信息"""
+        return {
+            'url': url,
+            'title': self._extract_title(soup),
+            'content': self._extract_content(soup),
+            'images': self._extract_images(soup),
+            'account_name': self.extract_account_name(soup),
+            'publish_date': self.extract_publish_date(soup),
+            'ocr_results': [],
+            'partial': False,
+            'pending_images': []
+        }
+    
     def _extract_title(self, soup):
         """提取文章标题"""
         # 尝试多种方式提取标题
@@ -160,56 +334,121 @@ class WeChatArticleScraper:
                         'alt': img.get('alt', ''),
                         'title': img.get('title', '')
                     })
+                else:
+                    metrics.IMAGES_SKIPPED.inc(reason='filtered')
         
         return images
     
-    def download_image(self, image_url, filename):
+    def download_image(self, image_url, filename, directory=None, deadline=None):
         """
         下载图片
         
         Args:
             image_url (str): 图片URL
             filename (str): 保存的文件名
+            directory (str): 保存目录或图片 pack 路径，默认为 output_dir
+            deadline (Deadline): 时间预算，为空表示不限时
             
         Returns:
-            str: 下载的文件路径，失败返回None
+            str: 下载的文件路径（写入 pack 时为 "<pack 路径>#<文件名>" 引用），失败返回None
+            
+        Raises:
+            fetcher.BlockedError: 触发反爬验证，应停止处理本篇文章的其余图片
+            fetcher.CircuitOpenError: 图片主机熔断中
         """
+        deadline = deadline or Deadline()
+        
+        def fetch():
+            with metrics.IMAGE_DOWNLOAD_SECONDS.time():
+                response = fetcher.fetch(self.session, image_url, headers=self.headers, deadline=deadline)
+            metrics.BYTES_DOWNLOADED.inc(len(response.content), kind='image')
+            return response.content
+        
         try:
-            response = self.session.get(image_url, headers=self.headers, timeout=30)
-            response.raise_for_status()
+            content = self._cached('image', image_url, fetch, config.CACHE_IMAGE_TTL, deadline)
             
-            file_path = os.path.join(self.output_dir, filename)
+            if image_store.is_pack(directory):
+                file_path = image_store.open_pack(directory).put(filename, content)
+                logger.info(f"成功下载图片: {filename}")
+                return file_path
             
-            with open(file_path, 'wb') as f:
-                f.write(response.content)
+            file_path = os.path.join(directory or self.output_dir, filename)
+            
+            # 先写临时文件再原子替换，共用目录的并发请求不会读到写了一半的图片
+            tmp_path = f"{file_path}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, file_path)
             
             logger.info(f"成功下载图片: {filename}")
             return file_path
             
+        except (fetcher.BlockedError, fetcher.CircuitOpenError):
+            metrics.IMAGES_SKIPPED.inc(reason='blocked')
+            raise
         except Exception as e:
             logger.error(f"下载图片失败 {image_url}: {str(e)}")
+            metrics.IMAGES_SKIPPED.inc(reason='download_failed')
             return None
     
-    def ocr_image(self, image_path):
+    def ocr_image(self, image_path, deadline=None, priority=ocr_scheduler.BULK, job_id=None):
         """
         对图片进行OCR识别
         
+        识别任务交由进程内共享的 OCR 调度器执行，交互请求优先于批量任务。
+        
         Args:
-            image_path (str): 图片文件路径
+            image_path (str): 图片文件路径或 pack 中的图片引用
+            deadline (Deadline): 时间预算，到期时终止 Tesseract 进程
+            priority (str): OCR 优先级，ocr_scheduler.INTERACTIVE 或 ocr_scheduler.BULK
+            job_id (str): 调度作业标识，同一作业的图片在调度器中轮转排队
             
         Returns:
             str: OCR识别结果
+            
+        Raises:
+            DeadlineExceeded: 时间预算在识别完成前用尽
+            SchedulerBusy: OCR 队列已满
         """
+        from PIL import Image
+        import pytesseract
+        
+        deadline = deadline or Deadline()
         try:
-            # 打开图片
-            image = Image.open(image_path)
+            # 打开图片（pack 中的图片直接引用 mmap，不逐个打开文件）
+            data = image_store.read_image(image_path)
+            image = Image.open(BytesIO(data))
+            if deadline.expired():
+                raise DeadlineExceeded("时间预算已用尽")
             
-            # 使用pytesseract进行OCR识别
-            # 设置语言为中文简体
-            text = pytesseract.image_to_string(image, lang='chi_sim')
+            def run():
+                # 任务开始执行时再计算剩余时间，排队耗时同样计入预算
+                remaining = deadline.remaining()
+                if remaining is not None and remaining <= 0:
+                    raise DeadlineExceeded("时间预算已用尽")
+                # 使用pytesseract进行OCR识别
+                # 设置语言为中文简体；timeout 到期时 pytesseract 会终止 Tesseract 子进程
+                with metrics.OCR_SECONDS.time():
+                    return pytesseract.image_to_string(image, lang='chi_sim', timeout=remaining or 0)
             
-            # 清理识别结果
-            text = text.strip()
+            def recognize():
+                # 交互任务队列满时只短暂等待，批量任务则阻塞等待（背压）
+                submit_timeout = deadline.remaining()
+                if priority == ocr_scheduler.INTERACTIVE:
+                    submit_timeout = deadline.timeout(config.OCR_INTERACTIVE_SUBMIT_TIMEOUT)
+                future = ocr_scheduler.get_scheduler().submit(
+                    profiling.call, run, priority=priority, job_id=job_id or image_path, timeout=submit_timeout
+                )
+                try:
+                    # 清理识别结果
+                    return future.result(timeout=deadline.remaining()).strip()
+                except FutureTimeoutError:
+                    future.cancel()
+                    raise DeadlineExceeded(f"OCR识别超出时间预算: {image_path}")
+            
+            # 按图片内容缓存识别结果，不同链接的相同图片只识别一次
+            key = f"chi_sim:{hashlib.sha1(data).hexdigest()}"
+            text = self._cached('ocr', key, recognize, config.CACHE_OCR_TTL, deadline)
             
             if text:
                 logger.info(f"OCR识别成功: {image_path}")
@@ -218,52 +457,214 @@ class WeChatArticleScraper:
                 logger.warning(f"OCR识别结果为空: {image_path}")
                 return "OCR识别结果为空"
                 
+        except DeadlineExceeded:
+            raise
+        except SchedulerBusy as e:
+            if deadline.expired():
+                raise DeadlineExceeded(f"OCR排队超出时间预算: {image_path}") from e
+            raise
         except Exception as e:
+            if deadline.expired():
+                raise DeadlineExceeded(f"OCR识别超出时间预算: {image_path}") from e
             logger.error(f"OCR识别失败 {image_path}: {str(e)}")
             return f"OCR识别失败: {str(e)}"
     
-    def process_article(self, url):
+    def warmup(self):
         """
-        处理完整的文章抓取流程
+        预先加载解析库与OCR引擎，避免首个请求承担冷启动开销
+        
+        Returns:
+            dict: 各组件的加载结果，如 {'ocr': {'ok': True, 'seconds': 0.42}}，失败时带 error
+        """
+        def load_parser():
+            from bs4 import BeautifulSoup
+            BeautifulSoup('<p>warmup</p>', 'html.parser')
+        
+        def load_ocr():
+            from PIL import Image
+            import pytesseract
+            # 识别一张空白图片，让 Tesseract 预先读入中文语言数据
+            pytesseract.image_to_string(Image.new('L', (64, 32), 255), lang='chi_sim')
         
+        steps = [
+            ('parser', load_parser),
+            ('ocr', load_ocr),
+            ('ocr_scheduler', ocr_scheduler.get_scheduler().start),
+        ]
+        results = {}
+        for name, step in steps:
+            start = time.perf_counter()
+            try:
+                step()
+                results[name] = {'ok': True}
+            except Exception as e:
+                logger.error(f"预热 {name} 失败: {e}")
+                results[name] = {'ok': False, 'error': str(e)}
+            results[name]['seconds'] = round(time.perf_counter() - start, 3)
+        return results
+    
+    def iter_article(self, url, with_images=True, delay=config.REQUEST_DELAY, deadline=None,
+                     priority=ocr_scheduler.BULK):
+        """
+        以生成器方式处理文章，逐项产出结果
+
+        先产出文章基本信息，再逐张产出图片的OCR结果，
+        调用方处理完一张即可丢弃，不必在内存中累积整篇文章的OCR结果。
+        指定时间预算时，预算用尽即停止处理剩余图片（正在运行的OCR会被终止）；
+        触发反爬验证或图片主机熔断时同样停止，不再继续请求。
+        提前停止时最后产出一项 'partial' 列出未处理的图片。
+        处理结束后文章与OCR文本写入全文检索索引（调用方提前退出时不写入）。
+
         Args:
             url (str): 微信公众号文章链接
-            
-        Returns:
-            dict: 完整的文章信息
+            with_images (bool): 是否下载图片并进行OCR识别
+            delay (float): 每张图片处理后的延迟（秒）
+            deadline (Deadline): 时间预算，为空表示不限时
+            priority (str): OCR 优先级，交互请求使用 ocr_scheduler.INTERACTIVE
+
+        Yields:
+            tuple: ('article', 文章信息)、('image', 单张图片OCR结果)
+                   或 ('partial', {'pending_images': [未处理的图片URL]})；
+                   文章获取失败时不产出任何内容
         """
+        deadline = deadline or Deadline()
+
         # 1. 获取文章内容
-        article_info = self.get_article_content(url)
+        article_info = self.get_article_content(url, deadline=deadline)
         if not article_info:
-            return None
-        
-        # 2. 下载图片并进行OCR识别
-        for i, img_info in enumerate(article_info['images']):
-            logger.info(f"处理第 {i+1} 张图片: {img_info['src']}")
-            
-            # 生成文件名
-            file_extension = self._get_file_extension(img_info['src'])
-            filename = f"image_{i+1}{file_extension}"
-            
-            # 下载图片
-            image_path = self.download_image(img_info['src'], filename)
-            
-            if image_path:
-                # OCR识别
-                ocr_text = self.ocr_image(image_path)
-                
-                # 保存OCR结果
-                article_info['ocr_results'].append({
+            return
+        yield 'article', article_info
+        if not with_images:
+            self._index_article(article_info)
+            return
+
+        # 2. 逐张下载图片到本篇文章的工作目录并进行OCR识别
+        images = article_info['images']
+        pending_from = None
+        stop_reason = None
+        ocr_texts = []
+        workspace = self.create_workspace(url)
+        try:
+            for i, img_info in enumerate(images):
+                if deadline.expired():
+                    pending_from = i
+                    stop_reason = "时间预算已用尽"
+                    break
+                logger.info(f"处理第 {i+1} 张图片: {img_info['src']}")
+                try:
+                    # 生成文件名
+                    file_extension = self._get_file_extension(img_info['src'])
+                    filename = f"{config.IMAGE_FILENAME_PREFIX}{i+1}{file_extension}"
+
+                    # 下载图片
+                    image_path = self.download_image(
+                        img_info['src'], filename, directory=workspace, deadline=deadline
+                    )
+                    if not image_path:
+                        if deadline.expired():
+                            raise DeadlineExceeded("下载图片超出时间预算")
+                        continue
+
+                    # OCR识别
+                    ocr_text = self.ocr_image(image_path, deadline=deadline, priority=priority, job_id=url)
+                except DeadlineExceeded:
+                    pending_from = i
+                    stop_reason = "时间预算已用尽"
+                    break
+                except (fetcher.BlockedError, fetcher.CircuitOpenError) as e:
+                    pending_from = i
+                    stop_reason = str(e)
+                    break
+                except SchedulerBusy:
+                    raise
+                except Exception as e:
+                    logger.error(f"处理图片 {i+1} 失败: {e}")
+                    if not config.CONTINUE_ON_ERROR:
+                        raise
+                    continue
+
+                # OCR失败时 ocr_image 返回的是错误说明，不写入索引
+                if not ocr_text.startswith("OCR识别失败"):
+                    ocr_texts.append(ocr_text)
+                yield 'image', {
                     'image_url': img_info['src'],
                     'local_path': image_path,
                     'ocr_text': ocr_text,
                     'alt': img_info['alt'],
                     'title': img_info['title']
-                })
-                
+                }
+
                 # 添加延迟，避免请求过于频繁
-                time.sleep(1)
+                if delay:
+                    time.sleep(deadline.timeout(delay))
+        finally:
+            self.release_workspace(workspace)
+
+        if pending_from is not None:
+            pending = [img['src'] for img in images[pending_from:]]
+            logger.warning(f"{stop_reason}，剩余 {len(pending)} 张图片未处理: {url}")
+            yield 'partial', {'pending_images': pending}
+        self._index_article(article_info, ocr_texts, partial=pending_from is not None)
+
+    def _index_article(self, article_info, ocr_texts=None, partial=False):
+        """把处理完的文章写入全文检索索引，索引失败不影响抓取结果"""
+        if self.search_index is None:
+            return
+        try:
+            self.search_index.add(article_info, ocr_texts, partial=partial)
+        except Exception as e:
+            logger.error(f"写入检索索引失败 {article_info['url']}: {e}")
+
+    async def aiter_article(self, url, with_images=True, delay=config.REQUEST_DELAY, deadline=None,
+                            priority=ocr_scheduler.BULK):
+        """
+        iter_article 的异步版本
+
+        阻塞的网络请求与OCR在线程池中执行，不会阻塞事件循环。
+        调用方提前退出（如客户端断开导致任务取消）时会取消时间预算，
+        线程中仍在进行的处理在下一个检查点停止，不会继续占用资源。
+        参数与产出内容同 iter_article。
+        """
+        deadline = deadline or Deadline()
+        gen = self.iter_article(url, with_images=with_images, delay=delay, deadline=deadline, priority=priority)
+        sentinel = object()
+        try:
+            while True:
+                item = await asyncio.to_thread(profiling.call, next, gen, sentinel)
+                if item is sentinel:
+                    break
+                yield item
+        finally:
+            deadline.cancel()
+            try:
+                gen.close()
+            except ValueError:
+                # 生成器仍在线程中执行，取消预算后会自行结束
+                pass
+
+    def process_article(self, url, with_images=True, delay=config.REQUEST_DELAY, deadline=None):
+        """
+        处理完整的文章抓取流程
         
+        Args:
+            url (str): 微信公众号文章链接
+            with_images (bool): 是否下载图片并进行OCR识别
+            delay (float): 每张图片处理后的延迟（秒）
+            deadline (Deadline): 时间预算，为空表示不限时
+            
+        Returns:
+            dict: 完整的文章信息；时间预算用尽时 partial 为 True，
+                  pending_images 列出未处理的图片
+        """
+        article_info = None
+        for kind, payload in self.iter_article(url, with_images=with_images, delay=delay, deadline=deadline):
+            if kind == 'article':
+                article_info = payload
+            elif kind == 'partial':
+                article_info['partial'] = True
+                article_info['pending_images'] = payload['pending_images']
+            else:
+                article_info['ocr_results'].append(payload)
         return article_info
     
     def _get_file_extension(self, url):
@@ -374,10 +775,11 @@ class FeishuBitableClient:
         if self._app_access_token:
             return self._app_access_token
         url = f"{self.base}/auth/v3/tenant_access_token/internal/"
-        resp = requests.post(url, json={
-            "app_id": self.app_id,
-            "app_secret": self.app_secret,
-        }, timeout=30)
+        with metrics.FEISHU_SECONDS.time(operation='tenant_access_token'):
+            resp = requests.post(url, json={
+                "app_id": self.app_id,
+                "app_secret": self.app_secret,
+            }, timeout=30)
         data = resp.json()
         if data.get("code") != 0:
             raise RuntimeError(f"获取tenant_access_token失败: {data}")
@@ -395,7 +797,8 @@ class FeishuBitableClient:
         url = f"{self.base}/bitable/v1/apps/{self.app_token}/tables/{self.table_id}/records"
         headers = {**self._get_authorization_header(), "Content-Type": "application/json"}
         payload = {"fields": fields}
-        resp = requests.post(url, headers=headers, json=payload, timeout=30)
+        with metrics.FEISHU_SECONDS.time(operation='add_record'):
+            resp = requests.post(url, headers=headers, json=payload, timeout=30)
         data = resp.json()
         if resp.status_code != 200 or data.get("code", 0) != 0:
             raise RuntimeError(f"写入飞书失败: status={resp.status_code}, body={resp.text}")
@@ -405,7 +808,8 @@ class FeishuBitableClient:
         """列出 base 下所有表（用于诊断 app_token 是否正确）"""
         url = f"{self.base}/bitable/v1/apps/{self.app_token}/tables"
         headers = self._get_authorization_header()
-        resp = requests.get(url, headers=headers, timeout=30)
+        with metrics.FEISHU_SECONDS.time(operation='list_tables'):
+            resp = requests.get(url, headers=headers, timeout=30)
         data = resp.json()
         if resp.status_code != 200 or data.get("code", 0) != 0:
             raise RuntimeError(f"获取表列表失败: status={resp.status_code}, body={resp.text}")
@@ -423,8 +827,64 @@ class FeishuBitableClient:
             )
 
 
-def main():
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="微信公众号文章抓取器")
+    parser.add_argument('--input', '-i',
+                        help="批量模式：文章链接列表文件（JSONL或每行一个链接），'-' 表示从标准输入读取")
+    parser.add_argument('--workers', '-w', type=int, default=config.BATCH_WORKERS,
+                        help="批量模式 / worker 模式并行工作线程数")
+    parser.add_argument('--output', '-o', default=config.BATCH_OUTPUT_FILE,
+                        help="批量模式结果输出路径（JSONL文件，或 Parquet 输出目录）")
+    parser.add_argument('--format', choices=['jsonl', 'parquet'], default=config.BATCH_OUTPUT_FORMAT,
+                        help="批量模式输出格式，为空时按输出路径扩展名推断")
+    parser.add_argument('--compression', choices=['none', 'gzip', 'zstd'],
+                        help="JSONL 输出压缩方式，为空时按扩展名（.gz / .zst）推断")
+    parser.add_argument('--checkpoint', default=config.BATCH_CHECKPOINT_FILE,
+                        help="批量模式断点文件，中断后再次运行将跳过已完成的文章")
+    parser.add_argument('--worker', action='store_true',
+                        help="worker 模式：从任务队列领取并处理任务（并发数由 --workers 指定）")
+    parser.add_argument('--queue', default=config.TASK_QUEUE_URL,
+                        help="worker 模式任务队列地址：sqlite:///path/to/tasks.db 或 redis://host:6379/0")
+    parser.add_argument('--compact-images', action='store_true',
+                        help="压缩 OUTPUT_DIR 下的图片 pack，回收被覆盖或删除的图片占用的空间")
+    return parser.parse_args(argv)
+
+
+def run_batch(args):
+    """批量模式入口"""
+    from batch_runner import BatchRunner, iter_urls
+    from result_sinks import create_sink
+
+    runner = BatchRunner(
+        sink=create_sink(args.output, fmt=args.format, compression=args.compression),
+        checkpoint_path=args.checkpoint,
+        workers=args.workers,
+        output_dir=config.OUTPUT_DIR,
+    )
+    stats = runner.run(iter_urls(args.input))
+    print(f"批量处理完成: 成功 {stats['succeeded']} 篇, 失败 {stats['failed']} 篇, 跳过 {stats['skipped']} 篇")
+    print(f"结果已写入: {args.output}")
+
+
+def main(argv=None):
     """主函数"""
+    from result_sinks import ConsoleSink
+
+    args = parse_args(argv)
+    if args.compact_images:
+        stats = image_store.compact_all(config.OUTPUT_DIR, min_waste=config.IMAGE_PACK_COMPACT_MIN_WASTE)
+        print(f"图片 pack 压缩完成: 检查 {stats['packs']} 个, 压缩 {stats['compacted']} 个, "
+              f"回收 {stats['reclaimed_bytes'] / 1024 / 1024:.1f} MB")
+        return
+    if args.worker:
+        from task_worker import run_worker
+        run_worker(args.queue, concurrency=args.workers)
+        return
+    if args.input:
+        run_batch(args)
+        return
+
     # 从配置读取文章链接
     article_url = getattr(config, 'ARTICLE_URL', "https://mp.weixin.qq.com/s/w0h03IsxfSrour3NpE_FqA")
     
@@ -439,18 +899,14 @@ def main():
     
     # 输出结果
     if article_info:
-        scraper.print_results(article_info)
+        ConsoleSink(scraper).write(article_info)
         
         # 写入飞书
         if getattr(config, 'FEISHU_ENABLED', False):
             try:
-                # 解析公众号名与发布日期
-                # 重新获取soup以抽取账号/日期（也可在get_article_content中保留soup，这里为简洁重复请求一次）
-                html = scraper.session.get(article_url, headers=scraper.headers, timeout=30)
-                html.raise_for_status()
-                soup = BeautifulSoup(html.text, 'html.parser')
-                account_name = scraper.extract_account_name(soup)
-                publish_date = scraper.extract_publish_date(soup)
+                # 公众号名与发布日期已在抓取文章时一并解析
+                account_name = article_info.get('account_name', '')
+                publish_date = article_info.get('publish_date', '')
 
                 fields_map = getattr(config, 'FEISHU_FIELDS', {})
                 client = FeishuBitableClient(